@@ -1,8 +1,8 @@
-from fastapi import APIRouter
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import func, select
-from app.connections.database import db
-from app.models.order import Order, OrderStatus
+from fastapi import APIRouter, Response
+from app.core import telemetry
+from app.services import order_metrics
+from app.services.latency import read_latency_percentiles
+from app.services.redis_service import async_redis_service, ORDER_QUEUE
 
 router = APIRouter()
 
@@ -11,30 +11,32 @@ router = APIRouter()
 async def get_order_metrics():
     """Fetch key metrics for orders, including average processing time and order status distribution."""
     try:
-        async with db.session() as session:
-            # Calculate the average processing time for completed orders
-            avg_time_query = select(
-                func.avg(Order.completed_at - Order.created_at)
-            ).where(Order.status == OrderStatus.COMPLETED)
-            avg_time_result = await session.execute(avg_time_query)
-            avg_processing_time = avg_time_result.scalar()
-            avg_processing_time = (
-                avg_processing_time.total_seconds() if avg_processing_time else 0
-            )
+        # Counters are maintained incrementally by the workers, so this is a single
+        # hash read regardless of how many orders exist
+        raw_metrics = await async_redis_service.redis_conn.hgetall(
+            order_metrics.METRICS_KEY
+        )
+        response = order_metrics.parse_metrics(raw_metrics)
+        # Queue wait, processing and end-to-end percentiles over 1m/5m/1h
+        response["latency_seconds"] = await read_latency_percentiles(
+            async_redis_service.redis_conn
+        )
+        return response
+    except Exception as e:
+        return {"error": f"Failed to fetch metrics: {str(e)}"}
 
-            # Get the count of orders grouped by status
-            status_query = select(Order.status, func.count()).group_by(Order.status)
-            status_result = await session.execute(status_query)
-            status_counts = dict(status_result.all())
 
-        # Ensure all statuses are included, even if their count is zero
-        order_statuses = {
-            status.value: status_counts.get(status, 0) for status in OrderStatus
-        }
+@router.get("/prometheus")
+async def get_prometheus_metrics():
+    """Expose API and worker metrics in the Prometheus text format."""
+    lane_depths = await async_redis_service.get_lane_depths()
+    pipeline_depth = await async_redis_service.redis_conn.llen("push_order_to_pipeline")
+    telemetry.QUEUE_DEPTH.labels(queue=ORDER_QUEUE).set(sum(lane_depths.values()))
+    for lane, depth in lane_depths.items():
+        telemetry.QUEUE_DEPTH.labels(queue=f"{ORDER_QUEUE}:{lane}").set(depth)
+    telemetry.QUEUE_DEPTH.labels(queue="push_order_to_pipeline").set(pipeline_depth)
 
-        return {
-            "average_processing_time_seconds": avg_processing_time,
-            "order_status_counts": order_statuses,
-        }
-    except Exception as e:
-        return {"error": f"Failed to fetch metrics: {str(e)}"}
+    return Response(
+        telemetry.render_metrics(),
+        headers={"Content-Type": telemetry.CONTENT_TYPE_LATEST},
+    )
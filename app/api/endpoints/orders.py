@@ -1,54 +1,440 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from redis.exceptions import RedisError
 from app import schemas
 from app.connections.database import db
 from app.models.managers.orders import OrderManager
-from app.services.redis_service import redis_service
+from app.services.redis_service import async_redis_service, lane_index, queue_orders, user_shard
+from app.models.order import OrderStatus
+from app.services import idempotency, order_metrics, order_status_cache, queue_codec
+from app.services.order_events import order_event_hub
+from app.tasks.order_save import push_order_to_pipeline
+from app.tasks.order_writer import order_writer
+from app.core.config import settings
+from datetime import datetime
+from typing import List, Optional
+import base64
 import json
+import orjson
+import time
 import uuid
 
 router = APIRouter()
 
-@router.post("/")
+# Single creates and bulk imports queue in separate lanes, so an import cannot hold back interactive orders
+INTERACTIVE_LANE = lane_index("interactive")
+BULK_LANE = lane_index("bulk")
+
+@router.post("/", response_model=schemas.OrderResponse)
 async def create_order(
     order: schemas.OrderCreate,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     """Creates a new order and pushes it to the Redis queue for processing."""
-    
+    if idempotency_key:
+        # A retry is answered from Redis without touching the database or the queues
+        previous = await idempotency.claim(async_redis_service.redis_conn, idempotency_key)
+        if previous == idempotency.IN_PROGRESS:
+            raise HTTPException(
+                status_code=409, detail="A request with this Idempotency-Key is in progress"
+            )
+        if previous is not None:
+            return Response(
+                previous, media_type="application/json", headers={"Idempotent-Replayed": "true"}
+            )
+
+    stored = False
+    try:
+        response = ORJSONResponse(await _create_and_enqueue(order, idempotency_key))
+        if idempotency_key:
+            await idempotency.store(async_redis_service.redis_conn, idempotency_key, response.body)
+            stored = True
+    finally:
+        # Also on cancellation. If even this fails, the claim expires after
+        # IDEMPOTENCY_CLAIM_TTL and a retry finds any committed order by its key.
+        if idempotency_key and not stored:
+            await idempotency.release(async_redis_service.redis_conn, idempotency_key)
+    return response
+
+
+async def _create_and_enqueue(order: schemas.OrderCreate, idempotency_key: Optional[str]) -> dict:
+    """Create the order, count, cache and enqueue it, and return the response fields."""
     # Generate a unique order ID
     order_id = f"ORD-{uuid.uuid4().hex}"
-    order_data = json.dumps({"order_id": order_id})
 
+    if settings.ORDER_WRITE_COALESCING:
+        # Shares a transaction with other orders arriving in the same few milliseconds
+        new_order = await order_writer.create_order(order_id, order.user_id, order.item_ids, order.total_amount, idempotency_key)
+    else:
+        async with db.session() as session:
+            order_manager = OrderManager(session)
+            # Persist order in the database
+            new_order = await order_manager.create_order(order_id, order.user_id, order.item_ids, order.total_amount, idempotency_key)
+    # Only the response model's columns are read, so no relationship is ever loaded
+    response = schemas.OrderResponse.model_validate(new_order).model_dump()
+
+    if response["order_id"] != order_id:
+        # The key was already used for an order that has been counted. A retry
+        # after an enqueue failure finds it still pending, so enqueue it again;
+        # if the first enqueue did land, the worker skips the duplicate claim.
+        if response["status"] == OrderStatus.PENDING:
+            await _enqueue_order(response["order_id"], response["user_id"])
+        return response
+
+    async with async_redis_service.redis_conn.pipeline(transaction=False) as pipe:
+        order_metrics.record_created(pipe)
+        order_status_cache.cache_orders(pipe, [response])
+        await pipe.execute()
+
+    await _enqueue_order(order_id, order.user_id)
+    return response
+
+
+async def _enqueue_order(order_id: str, user_id: str):
+    if settings.ORDER_PIPELINE_RELAY:
+        # Hand the order to RedisOrderProcessor, which enqueues it for processing
+        await async_redis_service.redis_conn.rpush(
+            "push_order_to_pipeline",
+            queue_codec.encode(order_id, time.time(), INTERACTIVE_LANE, user_shard(user_id)),
+        )
+    else:
+        # Push the order ID straight onto the processing queue
+        await push_order_to_pipeline(order_id, user_shard(user_id), INTERACTIVE_LANE)
+
+
+class BulkResultResponse(StreamingResponse):
+    """
+    StreamingResponse that sends results while the request body is still being read.
+
+    The stock response listens for a client disconnect on `receive` while it
+    streams, which would swallow the body chunks the generator is consuming.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/bulk")
+async def create_orders_bulk(request: Request):
+    """
+    Creates many orders from an NDJSON body (or a JSON array) and streams one result line per input line.
+
+    Input is handled BULK_BATCH_SIZE orders at a time: users and items are
+    validated with one query each, orders and order_items are inserted with
+    multi-row statements in one transaction, and every created order is
+    enqueued with a single Redis pipeline.
+    """
+    return BulkResultResponse(
+        _bulk_results(_read_bulk_lines(request)), media_type="application/x-ndjson"
+    )
+
+
+async def _read_bulk_lines(request: Request):
+    """Yield (line number, raw order) as the body arrives."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        body = await request.body()
+        try:
+            entries = json.loads(body)
+        except ValueError:
+            entries = None
+        if not isinstance(entries, list):
+            # Not an array: reported as one invalid line
+            yield 1, body
+            return
+        for line, entry in enumerate(entries, 1):
+            yield line, entry
+        return
+
+    buffer = b""
+    line = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for raw in complete:
+            line += 1
+            if raw.strip():
+                yield line, raw
+    if buffer.strip():
+        yield line + 1, buffer
+
+
+async def _bulk_results(lines):
+    batch = []
+    async for line, raw in lines:
+        try:
+            if isinstance(raw, bytes):
+                order = schemas.OrderCreate.model_validate_json(raw)
+            else:
+                order = schemas.OrderCreate.model_validate(raw)
+            batch.append((line, order))
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            batch.append((line, errors))
+
+        if len(batch) >= settings.BULK_BATCH_SIZE:
+            for result in await _create_bulk_batch(batch):
+                yield json.dumps(result, default=str) + "\n"
+            batch = []
+
+    if batch:
+        for result in await _create_bulk_batch(batch):
+            yield json.dumps(result, default=str) + "\n"
+
+
+async def _create_bulk_batch(batch: list) -> list:
+    """Create the valid orders of one batch and return a result per input line, in order."""
+    valid = [(line, order) for line, order in batch if isinstance(order, schemas.OrderCreate)]
+    orders = [
+        (f"ORD-{uuid.uuid4().hex}", order.user_id, order.item_ids, order.total_amount, None)
+        for _, order in valid
+    ]
+    try:
+        # A session per batch, so a long or stalled upload never holds a connection
+        if orders:
+            async with db.session() as session:
+                created = await OrderManager(session).create_orders(orders)
+        else:
+            created = []
+    except SQLAlchemyError as e:
+        created = [e] * len(orders)
+    outcome = {line: result for (line, _), result in zip(valid, created)}
+
+    new_orders = [row for row in created if isinstance(row, dict)]
+    queued = await _enqueue_bulk(new_orders) if new_orders else True
+
+    results = []
+    for line, order in batch:
+        result = outcome.get(line, order)
+        if isinstance(result, dict):
+            entry = {
+                "line": line,
+                "order_id": result["order_id"],
+                "status": result["status"].value,
+                "total_amount": result["total_amount"],
+            }
+            if not queued:
+                entry["error"] = "Order saved but could not be queued"
+            results.append(entry)
+        elif isinstance(result, SQLAlchemyError):
+            results.append({"line": line, "error": "Database error"})
+        elif isinstance(result, ValueError):
+            results.append({"line": line, "error": str(result)})
+        else:
+            results.append({"line": line, "error": result})
+    return results
+
+
+async def _enqueue_bulk(orders: list) -> bool:
+    """Record, cache and enqueue the created `orders` in one Redis pipeline, retrying like add_order_to_queue."""
+    queued = [(order["order_id"], user_shard(order["user_id"])) for order in orders]
+    for _ in range(3):
+        try:
+            async with async_redis_service.redis_conn.pipeline() as pipe:
+                order_metrics.record_created(pipe, len(queued))
+                order_status_cache.cache_orders(pipe, orders)
+                if settings.ORDER_PIPELINE_RELAY:
+                    enqueued_at = time.time()
+                    pipe.rpush(
+                        "push_order_to_pipeline",
+                        *[
+                            queue_codec.encode(order_id, enqueued_at, BULK_LANE, shard)
+                            for order_id, shard in queued
+                        ],
+                    )
+                else:
+                    queue_orders(pipe, BULK_LANE, queued)
+                await pipe.execute()
+            return True
+        except RedisError:
+            continue
+    return False
+
+
+@router.get("/", response_model=schemas.OrderPage)
+async def list_orders(
+    status: Optional[OrderStatus] = None,
+    user_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.ORDERS_PAGE_MAX),
+    export: bool = False,
+):
+    """
+    Lists orders oldest first, filtered by status, user and a [created_from, created_to) range.
+
+    Pages are keyset-paginated: pass `next_cursor` from one page as `cursor` to
+    get the next. With `export=true` every matching order (after `cursor`, if
+    given) is streamed as NDJSON from a server-side cursor instead.
+    """
+    filters = {
+        "status": status,
+        "user_id": user_id,
+        "created_from": created_from,
+        "created_to": created_to,
+        "after": _decode_cursor(cursor) if cursor else None,
+    }
+    if export:
+        return StreamingResponse(_export_orders(filters), media_type="application/x-ndjson")
+
+    limit = limit or settings.ORDERS_PAGE_SIZE
     async with db.session() as session:
-        order_manager = OrderManager(session)
-        # Persist order in the database
-        new_order = await order_manager.create_order(order_id, order.user_id, order.item_ids, order.total_amount)
-    
-    # Push the order ID to Redis queue for background processing
-    redis_service.redis_conn.rpush("push_order_to_pipeline", order_data)
+        # One extra row tells whether there is a next page
+        rows = await OrderManager(session).list_orders(limit + 1, **filters)
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    # Rows carry exactly OrderResponse's columns, so orjson can encode them as they are
+    return ORJSONResponse(
+        {"orders": [row._asdict() for row in rows[:limit]], "next_cursor": next_cursor}
+    )
+
+
+async def _export_orders(filters: dict):
+    async with db.session() as session:
+        rows = OrderManager(session).stream_orders(settings.ORDERS_EXPORT_CHUNK_SIZE, **filters)
+        async for row in rows:
+            yield orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE)
 
-    return new_order
+
+def _encode_cursor(row) -> str:
+    key = json.dumps([row.created_at.isoformat(), row.order_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), order_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/status")
 async def get_queue_status():
     """Fetches the status of the Redis order processing queue."""
-    return redis_service.get_queue_status()
+    return await async_redis_service.get_queue_status()
+
+
+@router.get("/events")
+async def stream_order_events(order_id: List[str] = Query(...)):
+    """
+    Streams status changes of the given orders as Server-Sent Events.
+
+    The stream starts with each order's current status and ends once every
+    order has completed. Unknown order IDs get a single `not_found` event.
+    """
+    order_ids = list(dict.fromkeys(order_id))
+    if len(order_ids) > settings.ORDER_EVENTS_MAX_ORDERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ORDER_EVENTS_MAX_ORDERS} orders per stream",
+        )
+    # Subscribe before reading the current statuses so no transition falls in between
+    subscription = order_event_hub.subscribe(order_ids)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many order event subscribers")
+
+    return OrderEventResponse(
+        subscription,
+        _order_event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+class OrderEventResponse(StreamingResponse):
+    """StreamingResponse that gives up its hub subscription however the stream ends, even before it starts."""
+
+    def __init__(self, subscription, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            order_event_hub.unsubscribe(self.subscription)
+
+
+async def _order_event_stream(subscription):
+    pending = set(subscription.order_ids)
+    for event in await _current_statuses(subscription.order_ids):
+        if event["status"] is None:
+            yield _sse("not_found", {"order_id": event["order_id"]})
+            pending.discard(event["order_id"])
+            continue
+        yield _sse("status", event)
+        if event["status"] == OrderStatus.COMPLETED.value:
+            pending.discard(event["order_id"])
 
+    while pending:
+        events = await subscription.get(settings.ORDER_EVENTS_KEEPALIVE)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield _sse("status", event)
+            if event["status"] == OrderStatus.COMPLETED.value:
+                pending.discard(event["order_id"])
 
-@router.get("/{order_id}")
+
+async def _current_statuses(order_ids: list) -> list:
+    """Current status of each order, from the status cache with one database query for misses."""
+    cached = await order_status_cache.read_orders(async_redis_service.redis_conn, order_ids)
+    missing = [order_id for order_id, order in cached.items() if order is None]
+    if missing:
+        async with db.session() as session:
+            for order in await OrderManager(session).get_orders(missing):
+                cached[order.order_id] = order_status_cache.to_response(
+                    order.order_id, order_status_cache.field_values(order)
+                )
+    return [
+        {
+            "order_id": order_id,
+            "status": order["status"] if order else None,
+            "updated_at": order["updated_at"] if order else None,
+        }
+        for order_id, order in cached.items()
+    ]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/{order_id}/details", response_model=schemas.OrderDetailResponse)
+async def get_order_details(order_id: str):
+    """Retrieves an order with its line items, quantities and prices at the time of ordering."""
+    async with db.session() as session:
+        orders = await OrderManager(session).get_order_details([order_id])
+
+    if not orders:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    return ORJSONResponse(schemas.OrderDetailResponse.model_validate(orders[0]).model_dump())
+
+
+@router.get("/{order_id}", response_model=schemas.OrderResponse)
 async def get_order_status(order_id: str):
     """Retrieves the status of a specific order using its order ID."""
-    try:
-        async with db.session() as session:
-            order_manager = OrderManager(session)
-            order = await order_manager.get_order(order_id)
-        
-        # If order is not found, return a 404 error
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
+    # Status polls are served from the Redis hash that creation and transitions write through
+    cached = await order_status_cache.read_order(async_redis_service.redis_conn, order_id)
+    if cached:
+        return ORJSONResponse(cached)
 
-        return order
-    finally:
-        # Close the database session after query execution
-        db.close()
+    async with db.session() as session:
+        order_manager = OrderManager(session)
+        order = await order_manager.get_order(order_id)
+
+    # If order is not found, return a 404 error
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    async with async_redis_service.redis_conn.pipeline(transaction=False) as pipe:
+        order_status_cache.fill_order(pipe, order)
+        await pipe.execute()
+    return ORJSONResponse(schemas.OrderResponse.model_validate(order).model_dump())
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from app.core.workers.worker_manager import worker_manager
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_worker_status():
+    """Report each worker's processes, their heartbeat age and how often they were restarted."""
+    return {"workers": worker_manager.status()}
@@ -1,15 +1,40 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 import logging
 from app.core.config import settings
+from app.connections.migrations import run_migrations
+from app.core.telemetry import DB_SESSION_DURATION
 import os
+import time
 import traceback
 
 logger = logging.getLogger(__name__)
 
 
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure a new SQLite connection for concurrent API and worker processes."""
+    pragmas = {
+        # WAL lets readers run alongside the single writer instead of blocking on it
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+        # Wait for the write lock instead of failing with "database is locked"
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
 class Database:
     def __init__(self):
         """Initialize the Database class with placeholders for engine, session factory, and Base model."""
@@ -21,24 +46,43 @@ class Database:
         """Initialize the database connection and session factory."""
         if not self._engine:
             try:
-                # Ensure the database directory exists
-                db_dir = os.path.dirname(settings.DB_PATH)
-                print(db_dir)
-
-                os.makedirs(os.path.dirname(settings.DB_PATH), exist_ok=True)
-
-                # Define the SQLite async database URL
-                DATABASE_URL = f"sqlite+aiosqlite:///{settings.DB_PATH}"
-
-                # Create an async engine for handling database operations
-                self._engine = create_async_engine(
-                    DATABASE_URL,
-                    echo=settings.DB_ECHO_LOG,  # Enable SQL query logging if configured
-                    connect_args={
-                        "check_same_thread": False,
-                        "timeout": 30,
-                    },  # SQLite-specific settings
+                url = make_url(
+                    settings.DATABASE_URL or f"sqlite+aiosqlite:///{settings.DB_PATH}"
                 )
+                if url.get_backend_name() == "sqlite":
+                    # Ensure the database directory exists
+                    db_dir = os.path.dirname(url.database)
+                    print(db_dir)
+
+                    os.makedirs(db_dir, exist_ok=True)
+
+                    # Create an async engine for handling database operations
+                    self._engine = create_async_engine(
+                        url,
+                        echo=settings.DB_ECHO_LOG,  # Enable SQL query logging if configured
+                        connect_args={
+                            "check_same_thread": False,
+                            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                            "cached_statements": settings.DB_STATEMENT_CACHE_SIZE,
+                        },  # SQLite-specific settings
+                    )
+                    # Apply the tuning profile to every new pooled connection
+                    event.listen(self._engine.sync_engine, "connect", _apply_sqlite_pragmas)
+                else:
+                    if url.get_driver_name() == "asyncpg":
+                        # Prepared statements cached per connection by the asyncpg dialect
+                        url = url.update_query_dict(
+                            {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+                        )
+                    # Server backends allow concurrent writers, so size the pool for them
+                    self._engine = create_async_engine(
+                        url,
+                        echo=settings.DB_ECHO_LOG,
+                        pool_size=settings.DB_POOL_SIZE,
+                        max_overflow=settings.DB_MAX_OVERFLOW,
+                        pool_pre_ping=settings.DB_POOL_PRE_PING,
+                        pool_recycle=settings.DB_POOL_RECYCLE,
+                    )
 
                 # Create a session factory for generating async sessions
                 self._async_session_factory = sessionmaker(
@@ -63,6 +107,8 @@ class Database:
             await conn.run_sync(
                 self.Base.metadata.create_all
             )  # Run table creation synchronously
+            # Bring databases created by older versions up to the current schema
+            await conn.run_sync(run_migrations, self.Base.metadata)
 
     @asynccontextmanager
     async def session(self) -> AsyncGenerator[AsyncSession, None]:
@@ -71,6 +117,7 @@ class Database:
             self.init_db()
 
         session: AsyncSession = self._async_session_factory()
+        started = time.perf_counter()
         try:
             yield session  # Yield session for usage within the context
         except Exception as e:
@@ -79,6 +126,14 @@ class Database:
             raise
         finally:
             await session.close()  # Ensure session is closed after usage
+            DB_SESSION_DURATION.observe(time.perf_counter() - started)
+
+    def after_fork(self):
+        """Drop pooled connections inherited from a parent process without closing them."""
+        if self._engine:
+            # close=False leaves the parent's connections untouched and gives
+            # this process a fresh, empty pool
+            self._engine.sync_engine.dispose(close=False)
 
     async def close(self):
         """Close the database connection and clean up resources."""
@@ -0,0 +1,96 @@
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping lives outside the models' metadata so create_all never touches it
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+def _create_indexes(*names):
+    """Build a migration that creates the named model indexes unless they already exist."""
+
+    def migrate(connection, metadata):
+        for table in metadata.tables.values():
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(connection, checkfirst=True)
+
+    return migrate
+
+
+def _add_columns(table_name, *names):
+    """Build a migration that adds the named model columns to an existing table."""
+
+    def migrate(connection, metadata):
+        table = metadata.tables[table_name]
+        existing = {column["name"] for column in inspect(connection).get_columns(table_name)}
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+
+    return migrate
+
+
+def _steps(*steps):
+    """Build a migration that runs `steps` in order."""
+
+    def migrate(connection, metadata):
+        for step in steps:
+            step(connection, metadata)
+
+    return migrate
+
+
+# Ordered (version, description, migration) entries; append new ones, never edit applied ones.
+# Fresh databases already get every model index from create_all, so each step must be idempotent.
+MIGRATIONS = [
+    (
+        1,
+        "Index orders by status and order_items by order_id",
+        _create_indexes(
+            "ix_orders_status_created_at",
+            "ix_orders_status_completed_at",
+            "ix_order_items_order_id",
+        ),
+    ),
+    (
+        2,
+        "Add orders.idempotency_key with a unique index",
+        _steps(
+            _add_columns("orders", "idempotency_key"),
+            _create_indexes("ux_orders_idempotency_key"),
+        ),
+    ),
+    (
+        3,
+        "Index orders for keyset pagination by created_at and order_id",
+        _create_indexes("ix_orders_created_at_order_id", "ix_orders_user_id_created_at"),
+    ),
+]
+
+
+def run_migrations(connection, metadata):
+    """Apply every migration not yet recorded in schema_migrations, in version order."""
+    migration_metadata.create_all(connection)
+    applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(connection, metadata)
+        connection.execute(
+            schema_migrations.insert().values(version=version, description=description)
+        )
+        logger.info(f"Applied migration {version}: {description}")
@@ -0,0 +1,104 @@
+import os
+from app.core.config import settings
+
+# prometheus_client picks its storage backend when first imported, so the shared
+# directory has to be in the environment before that happens. Every process
+# (API and workers) then writes its samples to its own files in this directory.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+MULTIPROC_DIR = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, by route template.",
+    ["method", "route"],
+)
+QUEUE_DEPTH = Gauge(
+    "order_queue_depth",
+    "Entries waiting in each Redis queue, sampled at scrape time.",
+    ["queue"],
+    multiprocess_mode="mostrecent",
+)
+BATCH_SIZE = Histogram(
+    "order_batch_size",
+    "Orders per batch taken by OrderProcessor.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+BATCH_DURATION = Histogram(
+    "order_batch_duration_seconds",
+    "Time OrderProcessor spends on one batch.",
+)
+DB_SESSION_DURATION = Histogram(
+    "db_session_duration_seconds",
+    "Time a database session stays open.",
+)
+ORDER_WRITE_BATCH_SIZE = Histogram(
+    "order_write_batch_size",
+    "Orders written per transaction by the POST /orders/ write coalescer.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250),
+)
+
+WORKER_PROCESS_COUNT = Gauge(
+    "worker_processes",
+    "Worker processes the autoscaler wants running, by worker.",
+    ["worker"],
+    multiprocess_mode="mostrecent",
+)
+TARGET_BATCH_SIZE = Gauge(
+    "order_batch_size_target",
+    "Batch size the autoscaler currently assigns to OrderProcessor.",
+    multiprocess_mode="mostrecent",
+)
+AUTOSCALE_DECISIONS = Counter(
+    "autoscale_decisions_total",
+    "Worker scale-ups and scale-downs made by the autoscaler.",
+    ["direction"],
+)
+
+
+def reset_multiproc_dir():
+    """Remove the samples of processes that are no longer running; call once before any worker starts."""
+    # Files are named <type>_<pid>.db. Other live processes, such as the rest of
+    # the uvicorn workers, still have theirs mapped, so only dead PIDs' files go.
+    for name in os.listdir(MULTIPROC_DIR):
+        pid = name[: -len(".db")].rsplit("_", 1)[-1]
+        if pid.isdigit() and not _pid_running(int(pid)):
+            os.remove(os.path.join(MULTIPROC_DIR, name))
+
+
+def _pid_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    return True
+
+
+def mark_process_dead(pid: int):
+    """Drop the live-gauge files of an exited process; its counters and histograms stay."""
+    multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+def render_metrics() -> bytes:
+    """Aggregate the samples written by every process into the text exposition format."""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    return generate_latest(registry)
@@ -0,0 +1,126 @@
+from app.core.config import settings
+from app.core.logging import worker_logger
+from app.core.telemetry import AUTOSCALE_DECISIONS, TARGET_BATCH_SIZE, WORKER_PROCESS_COUNT
+from app.services.redis_service import redis_service
+import math
+import time
+
+
+class AutoscalePolicy:
+    """
+    Decides how many OrderProcessor processes to run and how large their batches are.
+
+    Demand is the arrival rate plus whatever it takes to drain the current backlog
+    within the target queue wait. Workers are sized so each can meet its share of
+    demand at half the maximum batch size, leaving headroom for bursts; the batch
+    size is then whatever each worker needs to keep up. Scaling up is immediate,
+    scaling down happens one process at a time after `scale_down_ticks` quiet ticks.
+    """
+
+    def __init__(
+        self,
+        min_workers: int,
+        max_workers: int,
+        min_batch_size: int,
+        max_batch_size: int,
+        target_queue_wait: float,
+        scale_down_ticks: int = 3,
+    ):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_queue_wait = target_queue_wait
+        self.scale_down_ticks = scale_down_ticks
+        self._quiet_ticks = 0
+
+    def decide(
+        self,
+        queue_depth: int,
+        arrival_rate: float,
+        batch_latency: float,
+        workers: int,
+    ) -> dict:
+        """Return the worker count and batch size to use for the next interval."""
+        demand = arrival_rate + queue_depth / self.target_queue_wait
+        headroom_batch = max(self.min_batch_size, self.max_batch_size // 2)
+        needed = _clamp(
+            math.ceil(demand * batch_latency / headroom_batch),
+            self.min_workers,
+            self.max_workers,
+        )
+
+        if needed >= workers:
+            self._quiet_ticks = 0
+            target_workers = needed
+        else:
+            self._quiet_ticks += 1
+            target_workers = workers
+            if self._quiet_ticks >= self.scale_down_ticks:
+                self._quiet_ticks = 0
+                target_workers = workers - 1
+
+        batch_size = _clamp(
+            math.ceil(demand * batch_latency / target_workers),
+            self.min_batch_size,
+            self.max_batch_size,
+        )
+        return {"workers": target_workers, "batch_size": batch_size, "demand": demand}
+
+
+def _clamp(value, lower, upper):
+    return max(lower, min(upper, value))
+
+
+class OrderAutoscaler:
+    """Feeds live queue and batch measurements into AutoscalePolicy and applies its decisions."""
+
+    def __init__(self, worker, policy: AutoscalePolicy = None):
+        self.worker = worker
+        self.policy = policy or AutoscalePolicy(
+            settings.MIN_WORKER_PROCESSES,
+            settings.MAX_WORKER_PROCESSES,
+            settings.MIN_BATCH_SIZE,
+            settings.MAX_BATCH_SIZE,
+            settings.TARGET_QUEUE_WAIT_SECONDS,
+        )
+        # Until a batch has been observed, assume the simulated processing time
+        self.batch_latency = max(settings.ORDER_PROCESSING_DELAY, 0.01)
+        self._last_tick = None
+        self._last_enqueued = None
+
+    def tick(self):
+        """Sample the queue and workers once and resize them."""
+        now = time.monotonic()
+        queue_depth, enqueued_total = redis_service.get_queue_load()
+        batches, seconds = self.worker.take_batch_stats()
+        if batches:
+            self.batch_latency = seconds / batches
+
+        if self._last_tick is None:
+            # The arrival rate needs two samples
+            self._last_tick, self._last_enqueued = now, enqueued_total
+            return None
+        elapsed = now - self._last_tick
+        arrival_rate = max(0, enqueued_total - self._last_enqueued) / elapsed
+        self._last_tick, self._last_enqueued = now, enqueued_total
+
+        workers = len(self.worker.processes)
+        decision = self.policy.decide(queue_depth, arrival_rate, self.batch_latency, workers)
+
+        if decision["workers"] != workers:
+            direction = "up" if decision["workers"] > workers else "down"
+            AUTOSCALE_DECISIONS.labels(direction).inc()
+            worker_logger.info(
+                f"Scaling {self.worker.name} {direction} to {decision['workers']} processes "
+                f"(depth={queue_depth}, arrival={arrival_rate:.1f}/s, "
+                f"batch_latency={self.batch_latency:.3f}s)"
+            )
+            self.worker.scale_to(decision["workers"])
+        else:
+            self.worker.reap()
+        self.worker.batch_size.value = decision["batch_size"]
+
+        WORKER_PROCESS_COUNT.labels(self.worker.name).set(decision["workers"])
+        TARGET_BATCH_SIZE.set(decision["batch_size"])
+        return decision
@@ -1,49 +1,239 @@
-from multiprocessing import Process, Event, cpu_count
-import os
+from multiprocessing import Process, Event, Value, cpu_count
+from app.connections.database import db
+from app.services.redis_service import async_redis_service
+from app.core.config import settings
+from app.core.telemetry import mark_process_dead
+import asyncio
+import time
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 
+
+class WorkerSlot:
+    """A supervised position in a worker; it keeps its name and restart count across restarts."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.process = None
+        self.retire_event = None
+        # Wall-clock time of the last beat, written by the child process
+        self.heartbeat = None
+        self.started_at = None
+        self.restarts = 0
+        # Failures since the process last stayed up for a full backoff period
+        self.failures = 0
+        # Set while a crashed or hung process waits out its backoff
+        self.restart_at = None
+        self.last_failure = None
+
+
 class BaseWorker:
     def __init__(self, name: str, num_processes: int = None):
         self.name = name
-        self.processes = []
+        self.slots = []
         self.stop_event = Event()
+        # Retired slots whose process is still finishing its current work
+        self._retiring = []
+        self._next_index = 0
+        # Set inside each worker process by _run
+        self.retire_event = None
+        self.heartbeat = None
+        # Event loop owned by the worker process, created once in _run
+        self.loop = None
         # If num_processes not specified, use CPU count - 1 (leave one for main process)
         self.num_processes = num_processes or max(1, cpu_count() - 1)
 
+    @property
+    def processes(self):
+        return [slot.process for slot in self.slots]
+
     def start(self):
         """Start the worker processes"""
         self.stop_event.clear()
-        
-        for i in range(self.num_processes):
-            process = Process(
-                target=self._run,
-                name=f"{self.name}-{i}",
+
+        for _ in range(self.num_processes):
+            self._add_slot()
+
+    def _add_slot(self):
+        """Start a process in a new slot"""
+        slot = WorkerSlot(f"{self.name}-{self._next_index}")
+        self._next_index += 1
+        self._spawn(slot)
+        self.slots.append(slot)
+
+    def _spawn(self, slot: WorkerSlot):
+        """Start a fresh process in `slot`"""
+        slot.retire_event = Event()
+        slot.heartbeat = Value("d", time.time(), lock=False)
+        slot.process = Process(
+            target=self._run,
+            args=(slot.retire_event, slot.heartbeat),
+            name=slot.name,
+        )
+        slot.process.start()
+        slot.started_at = time.time()
+        slot.restart_at = None
+        logger.info(f"{slot.name} started with PID {slot.process.pid}")
+
+    def scale_to(self, num_processes: int):
+        """Spawn or retire processes until `num_processes` are running"""
+        self.reap()
+        while len(self.slots) < num_processes:
+            self._add_slot()
+        while len(self.slots) > num_processes:
+            # The newest process finishes its current batch and exits on its own
+            slot = self.slots.pop()
+            slot.retire_event.set()
+            slot.restart_at = None
+            self._retiring.append(slot)
+            logger.info(f"{slot.name} retiring")
+        self.num_processes = num_processes
+
+    def reap(self):
+        """Collect retired processes that have exited"""
+        for slot in list(self._retiring):
+            if not slot.process.is_alive():
+                slot.process.join()
+                mark_process_dead(slot.process.pid)
+                self._retiring.remove(slot)
+
+    def supervise(self):
+        """Restart processes that crashed or stopped sending heartbeats, with exponential backoff"""
+        if self.stop_event.is_set():
+            return
+        now = time.time()
+        for slot in self.slots:
+            if slot.restart_at is not None:
+                if now >= slot.restart_at:
+                    slot.restarts += 1
+                    self._spawn(slot)
+                continue
+
+            process = slot.process
+            if not process.is_alive():
+                slot.last_failure = f"exited with code {process.exitcode}"
+            elif now - slot.heartbeat.value > settings.WORKER_HANG_TIMEOUT:
+                slot.last_failure = "stopped sending heartbeats"
+                process.kill()
+            else:
+                continue
+            process.join(timeout=5)
+            mark_process_dead(process.pid)
+
+            # A process that stayed up for a full backoff period starts over at the base delay
+            if now - slot.started_at >= settings.WORKER_RESTART_BACKOFF_MAX:
+                slot.failures = 0
+            delay = min(
+                settings.WORKER_RESTART_BACKOFF_MAX,
+                settings.WORKER_RESTART_BACKOFF * 2**slot.failures,
             )
-            process.start()
-            self.processes.append(process)
-            logger.info(f"{process.name} started with PID {process.pid}")
+            slot.failures += 1
+            slot.restart_at = now + delay
+            logger.warning(
+                f"{slot.name} (PID {process.pid}) {slot.last_failure}; restarting in {delay:.1f}s"
+            )
+        self.reap()
 
-    def stop(self):
-        """Stop all worker processes"""
+    def stop(self, deadline: float = None):
+        """Stop all worker processes, letting them drain until `deadline` (time.monotonic())"""
+        # Workers leave their run loop, close their engine and event loop, and exit
         self.stop_event.set()
-        for process in self.processes:
-            process.join(timeout=10)
+        if deadline is None:
+            deadline = time.monotonic() + settings.WORKER_DRAIN_TIMEOUT
+        for slot in self.slots + self._retiring:
+            process = slot.process
+            process.join(timeout=max(0, deadline - time.monotonic()))
             if process.is_alive():
+                logger.warning(f"{slot.name} did not drain in time, terminating")
                 process.terminate()
-        self.processes.clear()
+                process.join(timeout=5)
+            mark_process_dead(process.pid)
+        self.slots.clear()
+        self._retiring.clear()
         logger.info(f"{self.name} workers stopped")
 
-    def _run(self):
+    def status(self) -> dict:
+        """Describe each process for the worker status endpoint"""
+        now = time.time()
+        slots = [(slot, self._state(slot)) for slot in self.slots]
+        slots += [(slot, "retiring") for slot in self._retiring]
+        return {
+            "name": self.name,
+            "target_processes": self.num_processes,
+            "restarts": sum(slot.restarts for slot in self.slots),
+            "processes": [
+                {
+                    "name": slot.name,
+                    "pid": slot.process.pid,
+                    "state": state,
+                    "uptime_seconds": round(now - slot.started_at, 3),
+                    "heartbeat_age_seconds": round(now - slot.heartbeat.value, 3),
+                    "restarts": slot.restarts,
+                    "last_failure": slot.last_failure,
+                }
+                for slot, state in slots
+            ],
+        }
+
+    @staticmethod
+    def _state(slot: WorkerSlot) -> str:
+        if slot.restart_at is not None:
+            return "restarting"
+        return "running" if slot.process.is_alive() else "exited"
+
+    def should_stop(self) -> bool:
+        """True once the worker is stopping or this process has been retired"""
+        if self.stop_event.is_set():
+            return True
+        return self.retire_event is not None and self.retire_event.is_set()
+
+    def beat(self):
+        """Tell the supervisor this process is still making progress"""
+        if self.heartbeat is not None:
+            self.heartbeat.value = time.time()
+
+    def idle(self, seconds: float):
+        """Sleep up to `seconds`, beating meanwhile and waking early when asked to stop"""
+        deadline = time.monotonic() + seconds
+        while not self.should_stop():
+            self.beat()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.stop_event.wait(min(remaining, 1.0))
+
+    def _run(self, retire_event=None, heartbeat=None):
         """Wrapper for the run method"""
+        self.retire_event = retire_event
+        self.heartbeat = heartbeat
+        # One event loop and one warm engine for the whole life of the process
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
         try:
+            self.loop.run_until_complete(self.setup())
+            self.beat()
             self.run()
         except Exception as e:
             traceback.print_exc()
             logger.error(f"Error in {self.name}: {e}")
+        finally:
+            self.loop.run_until_complete(self.teardown())
+            self.loop.close()
+
+    async def setup(self):
+        """Prepare per-process resources before run() starts"""
+        # A forked child must not reuse the connections pooled by its parent
+        db.after_fork()
+        async_redis_service.after_fork()
+        db.init_db()
+
+    async def teardown(self):
+        """Release per-process resources once run() returns"""
+        await db.close()
+        await async_redis_service.close()
 
     def run(self):
         """Override this method in child classes"""
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
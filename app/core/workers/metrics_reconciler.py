@@ -0,0 +1,33 @@
+from app.core.logging import worker_logger
+from app.core.config import settings
+from app.core.workers.base import BaseWorker
+from app.connections.database import db
+from app.models.managers.orders import OrderManager
+from app.services import order_metrics
+from app.services.redis_service import redis_service
+
+
+class MetricsReconciler(BaseWorker):
+    def __init__(self, num_processes: int = 1):
+        """Initialize the MetricsReconciler worker."""
+        super().__init__("MetricsReconciler", num_processes)
+
+    def run(self):
+        """Periodically rebuild the incremental order metrics from the database."""
+        while not self.should_stop():
+            try:
+                self.loop.run_until_complete(self.reconcile())
+            except Exception as e:
+                worker_logger.error(f"Metrics reconciliation failed: {e}", exc_info=True)
+            self.idle(settings.METRICS_RECONCILE_INTERVAL)
+
+    async def reconcile(self):
+        """Overwrite the Redis counters with totals computed by the database."""
+        async with db.session() as session:
+            summary = await OrderManager(session).get_status_summary()
+
+        # Updates recorded between the query and this write are folded in on the next run
+        with redis_service.redis_conn.pipeline() as pipe:
+            order_metrics.replace_metrics(pipe, summary)
+            pipe.execute()
+        worker_logger.info(f"Reconciled order metrics: {summary['status_counts']}")
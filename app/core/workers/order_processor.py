@@ -1,8 +1,9 @@
 from app.core.logging import worker_logger
-from app.services.redis_service import redis_service
-from datetime import datetime
+from app.services.redis_service import LANES, redis_service
+from multiprocessing import Array, Value
 import asyncio
 import os
+import socket
 from app.core.config import settings
 import time
 from app.core.workers.base import BaseWorker
@@ -10,78 +11,208 @@ from app.tasks.order_save import push_order_to_pipeline
 from app.connections.database import db
 from app.models.order import OrderStatus
 from app.models.managers.orders import OrderManager
-import json
+from app.services import order_events, order_metrics, order_status_cache, queue_codec
+from app.services.latency import LatencyRecorder
+from app.core.telemetry import BATCH_DURATION, BATCH_SIZE
+from datetime import datetime, timezone
 
 
 class OrderProcessor(BaseWorker):
     def __init__(self, num_processes: int = None):
         """Initialize the OrderProcessor worker."""
         super().__init__("OrderProcessor", num_processes)
+        # Created in each worker process by run()
+        self.latency_recorder = None
+        # Shared with every process so the autoscaler can resize batches at runtime
+        self.batch_size = Value("i", settings.BATCH_SIZE)
+        # Batches processed and seconds spent on them since the last take_batch_stats()
+        self.batch_stats = Array("d", 2)
 
     def run(self):
         """Main worker loop that processes orders from the Redis queue."""
         worker_id = os.getpid()
+        consumer = f"{socket.gethostname()}:{worker_id}"
         worker_logger.info(f"Worker started with PID: {worker_id}")
-
-        while True:
+        self.latency_recorder = LatencyRecorder(consumer)
+
+        # Recover batches from workers that died mid-batch (including a previous
+        # process that held our PID) before announcing ourselves as alive
+        reclaimed = redis_service.reclaim_orphaned_batches()
+        if reclaimed:
+            worker_logger.info(f"Worker {worker_id} requeued {reclaimed} orphaned orders")
+        last_reclaim = time.monotonic()
+        # Set when an error may have left a fetched batch in our processing list
+        requeue_pending = False
+        # Failed batches in a row, for the backoff
+        failures = 0
+
+        while not self.should_stop():
+            self.beat()
             try:
-                # Fetch a batch of order IDs from the Redis queue
-                with redis_service.redis_conn.pipeline() as pipe:
-                    pipe.lrange("order_queue", 0, settings.BATCH_SIZE - 1)  # Get orders
-                    pipe.ltrim(
-                        "order_queue", settings.BATCH_SIZE, -1
-                    )  # Remove processed orders
-                    results = pipe.execute()
-                    order_ids = results[0]
-
-                if order_ids:
+                redis_service.heartbeat(consumer, settings.WORKER_HEARTBEAT_TTL)
+                if requeue_pending:
+                    # Our heartbeat stays live, so reclaim would never return them
+                    redis_service.requeue_order_batch(consumer)
+                    requeue_pending = False
+                if time.monotonic() - last_reclaim >= settings.RECLAIM_INTERVAL:
+                    redis_service.reclaim_orphaned_batches()
+                    last_reclaim = time.monotonic()
+
+                # Block until orders arrive, then fill the batch up to the max wait
+                entries = redis_service.fetch_order_batch(
+                    consumer,
+                    self.batch_size.value,
+                    settings.QUEUE_BLOCK_TIMEOUT,
+                    settings.BATCH_MAX_WAIT_MS / 1000,
+                )
+
+                if entries:
                     worker_logger.info(
-                        f"Worker {worker_id} processing {len(order_ids)} orders"
+                        f"Worker {worker_id} processing {len(entries)} orders"
                     )
-                    asyncio.run(
-                        self.process_order_batch([oid.decode() for oid in order_ids])
+                    picked_up_at = time.time()
+                    orders, enqueued_at, lanes, legacy = [], {}, {}, []
+                    for raw in entries:
+                        try:
+                            entry = queue_codec.decode(raw)
+                        except Exception as e:
+                            worker_logger.error(f"Dead-lettering undecodable queue entry {raw!r}: {e}")
+                            redis_service.dead_letter(consumer, raw)
+                            continue
+                        orders.append(entry.order_id)
+                        if entry.enqueued_at is None:
+                            legacy.append(entry.order_id)
+                        else:
+                            enqueued_at[entry.order_id] = entry.enqueued_at
+                        if entry.lane is not None and entry.lane < len(LANES):
+                            lanes[entry.order_id] = LANES[entry.lane][0]
+                    if legacy:
+                        # Queued before the envelope; their enqueue time is in the old hash
+                        enqueued_at.update(redis_service.get_enqueue_times(legacy))
+                    processed = self.loop.run_until_complete(
+                        self.process_order_batch(orders, picked_up_at, enqueued_at, lanes)
                     )
-                else:
-                    time.sleep(0.01)  # Sleep briefly if no orders are available
+                    with self.batch_stats.get_lock():
+                        self.batch_stats[0] += 1
+                        self.batch_stats[1] += time.time() - picked_up_at
+                    if processed:
+                        redis_service.ack_order_batch(consumer, len(orders), legacy)
+                        failures = 0
+                    else:
+                        # The retry queue is served first, so without a pause this
+                        # worker would take the batch straight back
+                        redis_service.requeue_order_batch(consumer)
+                        failures += 1
+                        self.idle(self.error_backoff(failures))
             except Exception as e:
                 worker_logger.error(f"Worker {worker_id} error: {e}", exc_info=True)
-
-    async def process_order_batch(self, orders):
-        """Process a batch of orders asynchronously."""
+                requeue_pending = True
+                failures += 1
+                self.idle(self.error_backoff(failures))  # Back off while Redis is unavailable
+
+    @staticmethod
+    def error_backoff(failures: int) -> float:
+        """Seconds to pause after `failures` failed batches in a row."""
+        return min(settings.WORKER_ERROR_BACKOFF_MAX, settings.WORKER_ERROR_BACKOFF * 2 ** (failures - 1))
+
+    def take_batch_stats(self):
+        """Return (batches, seconds) observed since the previous call and reset them."""
+        with self.batch_stats.get_lock():
+            batches, seconds = self.batch_stats[0], self.batch_stats[1]
+            self.batch_stats[0] = self.batch_stats[1] = 0
+        return int(batches), seconds
+
+    async def process_order_batch(self, orders, picked_up_at=None, enqueued_at=None, lanes=None):
+        """Process a batch of orders asynchronously. Returns True once the batch is done."""
         if not orders:
-            return
+            return True
 
+        started = time.perf_counter()
+        BATCH_SIZE.observe(len(orders))
         try:
             worker_logger.info(f"Processing batch of {len(orders)} orders: {orders}")
 
             async with db.session() as session:
                 order_manager = OrderManager(session)
 
-                # Update order status to PROCESSING
-                await order_manager.update_bulk_orders(
-                    order_ids=orders, **{"status": OrderStatus.PROCESSING}
-                )
-
-                await asyncio.sleep(0.1)  # Simulate processing time
+                # Claim the orders; ones already claimed by an earlier delivery are skipped
+                claimed = await order_manager.start_orders(orders)
+                with redis_service.redis_conn.pipeline() as pipe:
+                    order_metrics.record_transition(
+                        pipe, OrderStatus.PENDING, OrderStatus.PROCESSING, len(claimed)
+                    )
+                    if claimed:
+                        claimed_ids = [order.order_id for order in claimed]
+                        order_status_cache.record_status(
+                            pipe, claimed_ids, OrderStatus.PROCESSING, claimed[0].updated_at
+                        )
+                        order_events.publish_transition(
+                            pipe, claimed_ids, OrderStatus.PROCESSING, claimed[0].updated_at
+                        )
+                    pipe.execute()
+
+                await asyncio.sleep(settings.ORDER_PROCESSING_DELAY)  # Simulate processing time
 
                 # Update order status to COMPLETED
-                completion_time = datetime.utcnow()
-                await order_manager.update_bulk_orders(
-                    order_ids=orders, **{"status": OrderStatus.COMPLETED}
+                completed = await order_manager.complete_orders(orders)
+                worker_logger.info(
+                    f"Claimed {len(claimed)} and completed {len(completed)} of {len(orders)} orders"
                 )
 
-            # Update processed count in Redis
+            # Update processed count and order metrics in Redis
             with redis_service.redis_conn.pipeline() as pipe:
                 pipe.incrby("total_processed", len(orders))
+                order_metrics.record_transition(
+                    pipe, OrderStatus.PROCESSING, OrderStatus.COMPLETED, len(completed)
+                )
+                order_metrics.record_durations(
+                    pipe,
+                    [
+                        (order.completed_at - order.created_at).total_seconds()
+                        for order in completed
+                    ],
+                )
+                if completed:
+                    completed_ids = [order.order_id for order in completed]
+                    completed_at = completed[0].completed_at
+                    order_status_cache.record_status(
+                        pipe, completed_ids, OrderStatus.COMPLETED, completed_at, completed_at
+                    )
+                    order_events.publish_transition(
+                        pipe, completed_ids, OrderStatus.COMPLETED, completed_at
+                    )
+                if self.latency_recorder:
+                    self._record_latencies(completed, picked_up_at, enqueued_at or {}, lanes or {})
+                    self.latency_recorder.flush(pipe)
                 pipe.execute()
 
             worker_logger.info(f"Completed batch of orders: {orders}")
+            return True
 
         except Exception as e:
             worker_logger.error(f"Error processing batch: {e}", exc_info=True)
+            return False
         finally:
-            if db:
-                await db.close()  # Ensure database connection is closed
+            BATCH_DURATION.observe(time.perf_counter() - started)
+
+    def _record_latencies(self, completed, picked_up_at, enqueued_at, lanes):
+        """Feed the queue wait (overall and per lane), processing and end-to-end time of each completed order."""
+        record = self.latency_recorder.record
+        for order in completed:
+            completed_at = _epoch(order.completed_at)
+            record("end_to_end", completed_at - _epoch(order.created_at))
+            if picked_up_at is not None:
+                record("processing", completed_at - picked_up_at)
+                if order.order_id in enqueued_at:
+                    wait = picked_up_at - enqueued_at[order.order_id]
+                    record("queue_wait", wait)
+                    if order.order_id in lanes:
+                        record(f"queue_wait:{lanes[order.order_id]}", wait)
+
+
+def _epoch(value: datetime) -> float:
+    """Seconds since the epoch for the naive UTC datetimes stored on orders."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
 
 
 class RedisOrderProcessor(BaseWorker):
@@ -91,18 +222,21 @@ class RedisOrderProcessor(BaseWorker):
 
     def run(self):
         """Continuously fetch and process tasks from Redis."""
-        while True:
-            task = redis_service.redis_conn.lpop(
-                "push_order_to_pipeline"
-            )  # Get next task
+        while not self.should_stop():
+            self.beat()
+            task = redis_service.redis_conn.blpop(
+                "push_order_to_pipeline", timeout=settings.QUEUE_BLOCK_TIMEOUT
+            )  # Wait for the next task
             if task:
                 try:
-                    task_data = json.loads(task)
-                    asyncio.run(
-                        push_order_to_pipeline(task_data["order_id"])
+                    entry = queue_codec.decode(task[1])
+                    self.loop.run_until_complete(
+                        push_order_to_pipeline(
+                            entry.order_id, entry.shard, entry.lane or 0, entry.enqueued_at
+                        )
                     )  # Process order
                     print(
-                        f"Executed push_order_to_pipeline for order ID: {task_data['order_id']}"
+                        f"Executed push_order_to_pipeline for order ID: {entry.order_id}"
                     )
                 except Exception as e:
                     print(f"Error executing task: {e}")
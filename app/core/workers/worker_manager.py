@@ -1,6 +1,9 @@
 from typing import List
 from app.core.workers.base import BaseWorker
+from app.core.config import settings
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -11,20 +14,64 @@ class WorkerManager:
     def __init__(self):
         """Initialize an empty list of workers."""
         self.workers: List[BaseWorker] = []
+        self.autoscalers = []
+        self._control_stop = threading.Event()
+        self._control_thread = None
 
     def add_worker(self, worker: BaseWorker):
         """Add a worker to the manager."""
         self.workers.append(worker)
 
+    def add_autoscaler(self, autoscaler):
+        """Register an autoscaler to be ticked by the control loop."""
+        self.autoscalers.append(autoscaler)
+
     def start_all(self):
-        """Start all registered workers."""
+        """Start all registered workers and the supervisor loop."""
         for worker in self.workers:
             worker.start()
+        self._control_stop.clear()
+        self._control_thread = threading.Thread(
+            target=self._control_loop, name="WorkerManager-control", daemon=True
+        )
+        self._control_thread.start()
 
     def stop_all(self):
-        """Stop all registered workers."""
+        """Stop all registered workers, giving them one shared drain deadline."""
+        # Stop supervising and resizing before tearing the workers down
+        self._control_stop.set()
+        if self._control_thread:
+            self._control_thread.join()
+            self._control_thread = None
+        # Every worker starts draining at once, then each is joined against the same deadline
+        for worker in self.workers:
+            worker.stop_event.set()
+        deadline = time.monotonic() + settings.WORKER_DRAIN_TIMEOUT
         for worker in self.workers:
-            worker.stop()
+            worker.stop(deadline)
+
+    def status(self) -> list:
+        """Per-worker process states and restart counts."""
+        return [worker.status() for worker in self.workers]
+
+    def _control_loop(self):
+        """Supervise the workers and periodically let each autoscaler resize its worker."""
+        next_autoscale = time.monotonic() + settings.AUTOSCALE_INTERVAL
+        while not self._control_stop.wait(settings.SUPERVISOR_INTERVAL):
+            for worker in self.workers:
+                try:
+                    worker.supervise()
+                except Exception as e:
+                    logger.error(f"Supervising {worker.name} failed: {e}", exc_info=True)
+
+            if time.monotonic() < next_autoscale:
+                continue
+            next_autoscale += settings.AUTOSCALE_INTERVAL
+            for autoscaler in self.autoscalers:
+                try:
+                    autoscaler.tick()
+                except Exception as e:
+                    logger.error(f"Autoscaler tick failed: {e}", exc_info=True)
 
 
 # Global instance of WorkerManager to manage workers across the application
@@ -0,0 +1,79 @@
+"""
+Measure OrderManager.create_order latency for orders with many line items.
+
+    python -m app.load_testing.bench_create_order --orders 200 --sizes 1 10 50 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+# Point the app at a throwaway database before any app module reads settings
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DB_ECHO_LOG"] = "false"
+
+from app.connections.database import db
+from app.models.managers.items import ItemManager
+from app.models.managers.orders import OrderManager
+from app.models.managers.users import UserManager
+
+CATALOG_SIZE = 500
+
+
+async def populate():
+    """Create one user and a catalog of items to order from."""
+    await db.create_all()
+    async with db.session() as session:
+        user = await UserManager(session).create_user(
+            name="Bench User", email="bench@example.com"
+        )
+    items = {}
+    async with db.session() as session:
+        item_manager = ItemManager(session)
+        for i in range(CATALOG_SIZE):
+            item = await item_manager.create_item(
+                name=f"Item {i}", description="", price=round(random.uniform(1, 100), 1)
+            )
+            items[item.id] = item.price
+    return user.id, items
+
+
+async def bench(user_id, items, size, orders):
+    """Create `orders` orders of `size` line items and return per-order latencies."""
+    item_ids = list(items)
+    latencies = []
+    for _ in range(orders):
+        # Sample with replacement so some orders carry repeated items
+        line_items = random.choices(item_ids, k=size)
+        total = sum(items[item_id] for item_id in line_items)
+        started = time.perf_counter()
+        async with db.session() as session:
+            await OrderManager(session).create_order(
+                f"ORD-{uuid.uuid4().hex}", user_id, line_items, total
+            )
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(args):
+    user_id, items = await populate()
+    for size in args.sizes:
+        latencies = sorted(await bench(user_id, items, size, args.orders))
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"{size:>4} items: mean {statistics.mean(latencies) * 1000:7.2f} ms"
+            f"  p99 {p99 * 1000:7.2f} ms"
+        )
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 100])
+    asyncio.run(main(parser.parse_args()))
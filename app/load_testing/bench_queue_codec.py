@@ -0,0 +1,97 @@
+"""
+Compare the queue entry formats: the JSON relay payload, the bare order ID
+with its enqueue time in a side hash, and the msgpack envelope.
+
+Reports the bytes each format stores per order and the CPU spent encoding and
+decoding it. With --redis-url it also fills a scratch database with --backlog
+orders in each format and reports the growth of Redis' used_memory.
+
+    python -m app.load_testing.bench_queue_codec --orders 100000
+    python -m app.load_testing.bench_queue_codec --redis-url redis://localhost:6379/15 --backlog 1000000
+"""
+import argparse
+import json
+import time
+import uuid
+
+from redis import Redis
+
+from app.services import queue_codec
+
+FORMATS = ("json", "bare id + hash", "envelope")
+
+
+def encoders():
+    now = time.time()
+    return {
+        "json": lambda order_id: json.dumps({"order_id": order_id}).encode(),
+        # The hash field is the order ID again, plus the stringified time
+        "bare id + hash": lambda order_id: order_id.encode(),
+        "envelope": lambda order_id: queue_codec.encode(order_id, now, 0, 0),
+    }
+
+
+def decoders():
+    return {
+        "json": lambda payload: json.loads(payload)["order_id"],
+        "bare id + hash": lambda payload: payload.decode(),
+        "envelope": queue_codec.decode,
+    }
+
+
+def stored_bytes(name, order_id, payload):
+    if name == "bare id + hash":
+        return len(payload) + len(order_id) + len(repr(time.time()))
+    return len(payload)
+
+
+def measure_cpu(order_ids):
+    print(f"{'format':<16} {'bytes/order':>12} {'encode us':>10} {'decode us':>10}")
+    for name in FORMATS:
+        encode, decode = encoders()[name], decoders()[name]
+        started = time.perf_counter()
+        payloads = [encode(order_id) for order_id in order_ids]
+        encode_us = (time.perf_counter() - started) / len(order_ids) * 1e6
+        started = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        decode_us = (time.perf_counter() - started) / len(order_ids) * 1e6
+        size = stored_bytes(name, order_ids[0], payloads[0])
+        print(f"{name:<16} {size:>12} {encode_us:>10.2f} {decode_us:>10.2f}")
+
+
+def measure_redis(redis_url, backlog, chunk):
+    redis_conn = Redis.from_url(redis_url)
+    print(f"\n{'format':<16} {'MiB for ' + str(backlog):>16}")
+    for name in FORMATS:
+        encode = encoders()[name]
+        redis_conn.flushdb()
+        before = redis_conn.info("memory")["used_memory"]
+        for start in range(0, backlog, chunk):
+            order_ids = [f"ORD-{uuid.uuid4().hex}" for _ in range(min(chunk, backlog - start))]
+            with redis_conn.pipeline(transaction=False) as pipe:
+                pipe.rpush("bench_queue", *[encode(order_id) for order_id in order_ids])
+                if name == "bare id + hash":
+                    now = time.time()
+                    pipe.hset("bench_enqueued_at", mapping={order_id: now for order_id in order_ids})
+                pipe.execute()
+        used = redis_conn.info("memory")["used_memory"] - before
+        print(f"{name:<16} {used / 2**20:>16.1f}")
+    redis_conn.flushdb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--redis-url", help="scratch Redis database; it is flushed")
+    parser.add_argument("--backlog", type=int, default=1000000)
+    parser.add_argument("--chunk", type=int, default=10000)
+    args = parser.parse_args()
+
+    measure_cpu([f"ORD-{uuid.uuid4().hex}" for _ in range(args.orders)])
+    if args.redis_url:
+        measure_redis(args.redis_url, args.backlog, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Measure database write throughput with several processes writing orders at once,
+the way the API and OrderProcessor workers share one database.
+
+Each process repeatedly inserts a batch of orders and moves it through
+PROCESSING and COMPLETED. Run it once per connection profile or backend, e.g.
+
+    python -m app.load_testing.bench_sqlite_writers
+    SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL python -m app.load_testing.bench_sqlite_writers
+    BENCH_DATABASE_URL=postgresql+asyncpg://localhost/bench python -m app.load_testing.bench_sqlite_writers
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import tempfile
+import time
+import uuid
+
+# Point the app at a throwaway directory before any app module reads settings
+BENCH_DIR = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(BENCH_DIR, "bench.db")
+# A throwaway SQLite file unless a server database is given explicitly
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", "")
+os.environ["DB_ECHO_LOG"] = "false"
+
+from sqlalchemy.exc import OperationalError
+from app.connections.database import db
+from app.core.config import settings
+from app.models.managers.orders import OrderManager
+from app.models.managers.users import UserManager
+from app.models.order import Order, OrderStatus
+
+
+async def create_user():
+    """Create the user the orders belong to (orders.user_id is a foreign key)."""
+    await db.create_all()
+    async with db.session() as session:
+        run_id = uuid.uuid4().hex
+        user = await UserManager(session).create_user(
+            name="Bench User", email=f"bench-{run_id}@example.com"
+        )
+    await db.close()
+    return user.id
+
+
+async def write_orders(worker, user_id, batch_size, seconds):
+    """Write batches until `seconds` have passed; return (orders written, lock errors)."""
+    written = errors = batch = 0
+    run_id = uuid.uuid4().hex[:8]
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        order_ids = [f"ORD-{worker}-{run_id}-{batch}-{i}" for i in range(batch_size)]
+        batch += 1
+        try:
+            async with db.session() as session:
+                session.add_all(
+                    Order(order_id=order_id, user_id=user_id, total_amount=1.0)
+                    for order_id in order_ids
+                )
+                await session.commit()
+                order_manager = OrderManager(session)
+                await order_manager.transition_orders(
+                    order_ids, OrderStatus.PENDING, OrderStatus.PROCESSING
+                )
+                await order_manager.transition_orders(
+                    order_ids, OrderStatus.PROCESSING, OrderStatus.COMPLETED
+                )
+            written += batch_size
+        except OperationalError:
+            errors += 1
+    await db.close()
+    return written, errors
+
+
+def writer(worker, user_id, batch_size, seconds, results):
+    db.after_fork()
+    try:
+        results.put(asyncio.run(write_orders(worker, user_id, batch_size, seconds)))
+    except Exception as e:
+        # Report instead of dying silently, which would leave run() waiting
+        results.put(e)
+
+
+def run(processes, batch_size, seconds):
+    # A fresh SQLite file per run so WAL state and table size don't carry over
+    settings.DB_PATH = os.path.join(BENCH_DIR, f"bench-{processes}.db")
+    user_id = asyncio.run(create_user())
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=writer, args=(i, user_id, batch_size, seconds, results)
+        )
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    totals = []
+    try:
+        for _ in workers:
+            # Generous, but bounded in case a process dies without reporting
+            totals.append(results.get(timeout=seconds + 60))
+    except queue.Empty:
+        totals.append(RuntimeError("a writer process exited without reporting"))
+    for process in workers:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    failures = [result for result in totals if isinstance(result, Exception)]
+    if failures:
+        print(f"{processes} process(es): failed: {failures[0]!r}")
+        return
+
+    written = sum(count for count, _ in totals)
+    errors = sum(count for _, count in totals)
+    print(
+        f"{processes} process(es): {written / seconds:9.1f} orders/s"
+        f"  ({errors} lock errors)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    if settings.DATABASE_URL:
+        print(f"database={settings.DATABASE_URL}")
+    else:
+        print(
+            f"journal_mode={settings.SQLITE_JOURNAL_MODE}"
+            f" synchronous={settings.SQLITE_SYNCHRONOUS}"
+        )
+    for processes in args.processes:
+        run(processes, args.batch_size, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
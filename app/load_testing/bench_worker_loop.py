@@ -0,0 +1,94 @@
+"""
+Compare OrderProcessor batch throughput with a new event loop and engine per
+batch (the old asyncio.run + db.close behaviour) against one long-lived loop
+and engine per worker process.
+
+    python -m app.load_testing.bench_worker_loop --batches 200 --batch-size 100
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Point the app at a throwaway database before any app module reads settings
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DB_ECHO_LOG"] = "false"
+
+from app.connections.database import db
+from app.models.managers.orders import OrderManager
+from app.models.order import Order, OrderStatus
+
+
+async def create_orders(count):
+    """Insert `count` pending orders and return their IDs."""
+    await db.create_all()
+    order_ids = [f"ORD-bench-{i:08d}" for i in range(count)]
+    async with db.session() as session:
+        session.add_all(
+            Order(order_id=order_id, user_id="bench-user", total_amount=1.0)
+            for order_id in order_ids
+        )
+        await session.commit()
+    return order_ids
+
+
+async def process_batch(order_ids):
+    """The database work OrderProcessor does for one batch."""
+    async with db.session() as session:
+        order_manager = OrderManager(session)
+        await order_manager.update_bulk_orders(
+            order_ids=order_ids, status=OrderStatus.PROCESSING
+        )
+        await order_manager.update_bulk_orders(
+            order_ids=order_ids, status=OrderStatus.COMPLETED
+        )
+
+
+def run_per_batch(batches):
+    """New event loop and engine for every batch."""
+
+    async def process_and_close(order_ids):
+        try:
+            await process_batch(order_ids)
+        finally:
+            await db.close()
+
+    for order_ids in batches:
+        asyncio.run(process_and_close(order_ids))
+
+
+def run_persistent(batches):
+    """One event loop and engine shared by every batch."""
+    loop = asyncio.new_event_loop()
+    try:
+        for order_ids in batches:
+            loop.run_until_complete(process_batch(order_ids))
+        loop.run_until_complete(db.close())
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    order_ids = asyncio.run(create_orders(args.batches * args.batch_size))
+    asyncio.run(db.close())
+    batches = [
+        order_ids[i : i + args.batch_size]
+        for i in range(0, len(order_ids), args.batch_size)
+    ]
+
+    for name, runner in (("per-batch", run_per_batch), ("persistent", run_persistent)):
+        started = time.perf_counter()
+        runner(batches)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>10}: {len(batches) / elapsed:8.1f} batches/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
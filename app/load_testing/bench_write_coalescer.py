@@ -0,0 +1,115 @@
+"""
+Compare concurrent single-order creates that each commit on their own
+(OrderManager.create_order) against the same load through the write
+coalescer, which groups them into shared transactions.
+
+    python -m app.load_testing.bench_write_coalescer --orders 2000 --concurrency 50 --windows 0 2 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+# Point the app at a throwaway database before any app module reads settings
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DB_ECHO_LOG"] = "false"
+
+from app.connections.database import db
+from app.models.managers.items import ItemManager
+from app.models.managers.orders import OrderManager
+from app.models.managers.users import UserManager
+from app.tasks.order_writer import OrderWriteCoalescer
+
+CATALOG_SIZE = 100
+
+
+async def populate():
+    """Create one user and a catalog of items to order from."""
+    await db.create_all()
+    async with db.session() as session:
+        user = await UserManager(session).create_user(
+            name="Bench User", email="bench@example.com"
+        )
+    items = {}
+    async with db.session() as session:
+        item_manager = ItemManager(session)
+        for i in range(CATALOG_SIZE):
+            item = await item_manager.create_item(
+                name=f"Item {i}", description="", price=round(random.uniform(1, 100), 1)
+            )
+            items[item.id] = item.price
+    return user.id, items
+
+
+async def create_direct(order):
+    async with db.session() as session:
+        await OrderManager(session).create_order(*order)
+
+
+async def run(create, orders, concurrency):
+    """Create `orders` with `concurrency` concurrent callers; returns (elapsed, latencies)."""
+    pending = list(orders)
+    latencies = []
+
+    async def client():
+        while pending:
+            order = pending.pop()
+            started = time.perf_counter()
+            await create(order)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def make_orders(user_id, items, count):
+    item_ids = list(items)
+    orders = []
+    for _ in range(count):
+        line_items = random.choices(item_ids, k=3)
+        total = sum(items[item_id] for item_id in line_items)
+        orders.append((f"ORD-{uuid.uuid4().hex}", user_id, line_items, total))
+    return orders
+
+
+def report(name, elapsed, latencies):
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:<16} {len(latencies) / elapsed:8.0f} orders/s"
+        f"  mean {statistics.mean(latencies) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms"
+    )
+
+
+async def main(args):
+    user_id, items = await populate()
+
+    elapsed, latencies = await run(
+        create_direct, make_orders(user_id, items, args.orders), args.concurrency
+    )
+    report("direct", elapsed, latencies)
+
+    for window in args.windows:
+        writer = OrderWriteCoalescer(args.max_batch, window)
+        elapsed, latencies = await run(
+            lambda order: writer.create_order(*order),
+            make_orders(user_id, items, args.orders),
+            args.concurrency,
+        )
+        await writer.stop()
+        report(f"coalesced {window:g} ms", elapsed, latencies)
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Fail if POST /orders/bulk stops answering a body that arrives in several ASGI
+messages, as it does from a real client, for both NDJSON and a JSON array.
+
+Calls the ASGI app directly, since test clients hand over the body in one
+message. Redis does not need to be running: orders are created either way and
+their result lines report whether they were queued.
+
+    python -m app.load_testing.check_bulk_streaming
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database before any app module reads settings
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bulk.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DB_ECHO_LOG"] = "false"
+
+from app.connections.database import db
+from app.main import app
+from app.models.managers.items import ItemManager
+from app.models.managers.users import UserManager
+
+TIMEOUT = 10
+
+
+async def post_in_chunks(content_type: str, chunks: list) -> list:
+    """Send `chunks` as separate http.request messages and return the response lines."""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    disconnected = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if messages:
+            message = messages.pop(0)
+            # Let the app interleave sending with reading, like a slow upload
+            await asyncio.sleep(0.01)
+            return message
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/orders/bulk",
+        "raw_path": b"/orders/bulk",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", content_type.encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+    }
+    await asyncio.wait_for(app(scope, receive, send), TIMEOUT)
+    disconnected.set()
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return [json.loads(line) for line in body.splitlines()]
+
+
+async def main() -> int:
+    await db.create_all()
+    async with db.session() as session:
+        user = await UserManager(session).create_user(name="Check", email="check@example.com")
+        item = await ItemManager(session).create_item(name="Item", description="", price=2.0)
+    order = {"user_id": user.id, "item_ids": [item.id], "total_amount": 2.0}
+    ndjson = b"".join(json.dumps(order).encode() + b"\n" for _ in range(5))
+    array = json.dumps([order] * 5).encode()
+
+    failures = 0
+    for name, content_type, body in (
+        ("ndjson", "application/x-ndjson", ndjson),
+        ("json array", "application/json", array),
+    ):
+        # Split mid-line so a line spans two messages
+        chunks = [body[i:i + 40] for i in range(0, len(body), 40)]
+        try:
+            lines = await post_in_chunks(content_type, chunks)
+        except asyncio.TimeoutError:
+            print(f"{name}: no response after {TIMEOUT}s")
+            failures += 1
+            continue
+        created = [line for line in lines if "order_id" in line]
+        ok = len(lines) == 5 and len(created) == 5
+        failures += not ok
+        print(f"{name}: {len(chunks)} chunks, {len(created)}/5 created {'ok' if ok else 'FAIL'}")
+    await db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
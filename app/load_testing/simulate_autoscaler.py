@@ -0,0 +1,151 @@
+"""
+Drive bursty synthetic load through AutoscalePolicy and compare it with static
+worker/batch configurations, without Redis or a database.
+
+Time advances in small steps. Orders arrive at a base rate with periodic bursts,
+idle workers take up to `batch_size` orders off the queue, and a batch of b
+orders keeps its worker busy for L(b) = --batch-overhead + --per-order * b
+seconds. For the autoscaled run the policy is ticked every --interval seconds
+with the same measurements OrderAutoscaler takes from Redis, and new processes
+only start taking work after --spawn-delay seconds.
+
+    python -m app.load_testing.simulate_autoscaler --duration 600 --burst-rate 3000
+"""
+import argparse
+import random
+from collections import deque
+
+from app.core.workers.autoscaler import AutoscalePolicy
+
+
+def arrival_rate(t, args):
+    """Orders per second at time t: the base rate, plus a burst at the start of every period."""
+    if t % args.burst_every < args.burst_length:
+        return args.burst_rate
+    return args.base_rate
+
+
+def percentile(sorted_values, quantile):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+
+def simulate(args, workers, batch_size, policy=None):
+    """Run one configuration and return its queue-wait percentiles and cost."""
+    rng = random.Random(args.seed)
+    queue = deque()
+    # Time at which each worker can take its next batch
+    busy_until = [0.0] * workers
+    waits = []
+    worker_seconds = 0.0
+    max_workers_seen = workers
+    arrived = 0
+    last_arrived = 0
+    batch_count = 0
+    batch_seconds = 0.0
+    next_tick = args.interval
+
+    steps = int(args.duration / args.step)
+    for step in range(steps):
+        t = step * args.step
+
+        # Poisson-ish arrivals spread over the step that just ended
+        expected = arrival_rate(t, args) * args.step
+        count = int(expected) + (rng.random() < expected - int(expected))
+        queue.extend(t - rng.random() * args.step for _ in range(count))
+        arrived += count
+
+        for index, free_at in enumerate(busy_until):
+            if free_at > t or not queue:
+                continue
+            taken = min(batch_size, len(queue))
+            for _ in range(taken):
+                waits.append(t - queue.popleft())
+            latency = args.batch_overhead + args.per_order * taken
+            busy_until[index] = t + latency
+            batch_count += 1
+            batch_seconds += latency
+
+        worker_seconds += len(busy_until) * args.step
+
+        if policy is not None and t >= next_tick:
+            rate = (arrived - last_arrived) / args.interval
+            observed = batch_seconds / batch_count if batch_count else args.batch_overhead
+            decision = policy.decide(len(queue), rate, observed, len(busy_until))
+            target = decision["workers"]
+            while len(busy_until) < target:
+                busy_until.append(t + args.spawn_delay)
+            if len(busy_until) > target:
+                # Retire the newest processes once their current batch is done
+                del busy_until[target:]
+            batch_size = decision["batch_size"]
+            max_workers_seen = max(max_workers_seen, len(busy_until))
+            last_arrived, batch_count, batch_seconds = arrived, 0, 0.0
+            next_tick += args.interval
+
+    waits.sort()
+    return {
+        "processed": len(waits),
+        "backlog": len(queue),
+        "p50": percentile(waits, 0.5),
+        "p99": percentile(waits, 0.99),
+        "max": waits[-1] if waits else 0.0,
+        "worker_seconds": worker_seconds,
+        "max_workers": max_workers_seen,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=600.0)
+    parser.add_argument("--step", type=float, default=0.01)
+    parser.add_argument("--base-rate", type=float, default=200.0)
+    parser.add_argument("--burst-rate", type=float, default=3000.0)
+    parser.add_argument("--burst-every", type=float, default=60.0)
+    parser.add_argument("--burst-length", type=float, default=10.0)
+    parser.add_argument("--batch-overhead", type=float, default=0.1)
+    parser.add_argument("--per-order", type=float, default=0.0005)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--spawn-delay", type=float, default=1.0)
+    parser.add_argument("--min-workers", type=int, default=1)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--min-batch", type=int, default=10)
+    parser.add_argument("--max-batch", type=int, default=500)
+    parser.add_argument("--target-wait", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    configs = [
+        ("static 1x100", 1, 100, None),
+        ("static 4x100", 4, 100, None),
+        ("static 8x250", 8, 250, None),
+        (
+            "autoscaled",
+            args.min_workers,
+            args.min_batch,
+            AutoscalePolicy(
+                args.min_workers,
+                args.max_workers,
+                args.min_batch,
+                args.max_batch,
+                args.target_wait,
+            ),
+        ),
+    ]
+
+    print(
+        f"{'config':<14} {'processed':>10} {'backlog':>8} {'p50 wait':>9} "
+        f"{'p99 wait':>9} {'max wait':>9} {'worker-s':>9} {'peak':>5}"
+    )
+    for name, workers, batch_size, policy in configs:
+        result = simulate(args, workers, batch_size, policy)
+        print(
+            f"{name:<14} {result['processed']:>10} {result['backlog']:>8} "
+            f"{result['p50']:>8.3f}s {result['p99']:>8.3f}s {result['max']:>8.3f}s "
+            f"{result['worker_seconds']:>9.0f} {result['max_workers']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measure queue wait for small tenants while one large tenant floods the queue,
+with a single FIFO, with priority lanes, and with lanes plus user_id shards.
+
+The real enqueue and batch scripts run against a scratch Redis database (it is
+flushed); only time is simulated. Small tenants send --small-rate orders per
+second through the interactive lane. From --flood-start on, one large tenant
+adds --flood-rate orders per second for --flood-length seconds, through the bulk
+lane or, with --flood-lane interactive, as ordinary creates. --workers workers
+take batches of up to --batch-size orders, and a batch of b orders keeps its
+worker busy for --batch-overhead + --per-order * b seconds.
+
+    python -m app.load_testing.simulate_fair_queue --redis-url redis://localhost:6379/15
+    python -m app.load_testing.simulate_fair_queue --redis-url redis://localhost:6379/15 --flood-lane interactive
+"""
+import argparse
+import random
+import zlib
+
+from app.services import queue_codec
+from app.services.redis_service import RedisService, parse_lanes, queue_orders
+
+INTERACTIVE, BULK = 0, 1
+
+
+def percentile(sorted_values, quantile):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+
+def arrivals(rng, rate, step):
+    expected = rate * step
+    return int(expected) + (rng.random() < expected - int(expected))
+
+
+def simulate(args, lanes, shards):
+    """Run one queue layout and return the waits of small tenants and of the large one."""
+    service = RedisService(args.redis_url, lanes)
+    service.redis_conn.flushdb()
+    rng = random.Random(args.seed)
+    flood_lane = INTERACTIVE if args.flood_lane == "interactive" or len(lanes) == 1 else BULK
+    busy_until = [0.0] * args.workers
+    waits = {"small": [], "large": []}
+    sequence = 0
+
+    def enqueue(pipe, lane, user, t):
+        nonlocal sequence
+        sequence += 1
+        shard = zlib.crc32(user.encode()) % shards
+        # Spread over the step that just ended
+        enqueued_at = t - rng.random() * args.step
+        queue_orders(pipe, lane, [(f"{user}-{sequence}", shard)], enqueued_at)
+
+    steps = int(args.duration / args.step)
+    for step in range(steps):
+        t = step * args.step
+        with service.redis_conn.pipeline(transaction=False) as pipe:
+            for _ in range(arrivals(rng, args.small_rate, args.step)):
+                enqueue(pipe, INTERACTIVE, f"small{rng.randrange(args.small_tenants)}", t)
+            if args.flood_start <= t < args.flood_start + args.flood_length:
+                for _ in range(arrivals(rng, args.flood_rate, args.step)):
+                    enqueue(pipe, flood_lane, "large", t)
+            pipe.execute()
+
+        for index, free_at in enumerate(busy_until):
+            if free_at > t:
+                continue
+            processing_key = f"simulate:processing:{index}"
+            entries = service.take_order_batch(processing_key, args.batch_size)
+            if not entries:
+                continue
+            service.redis_conn.delete(processing_key)
+            for entry in map(queue_codec.decode, entries):
+                tenant = "large" if entry.order_id.startswith("large") else "small"
+                waits[tenant].append(t - entry.enqueued_at)
+            busy_until[index] = t + args.batch_overhead + args.per_order * len(entries)
+
+    backlog, _ = service.get_queue_load()
+    service.redis_conn.flushdb()
+    for values in waits.values():
+        values.sort()
+    return waits, backlog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--redis-url", required=True, help="scratch Redis database; it is flushed")
+    parser.add_argument("--duration", type=float, default=120.0)
+    parser.add_argument("--step", type=float, default=0.05)
+    parser.add_argument("--small-tenants", type=int, default=200)
+    parser.add_argument("--small-rate", type=float, default=300.0)
+    parser.add_argument("--flood-rate", type=float, default=3000.0)
+    parser.add_argument("--flood-start", type=float, default=10.0)
+    parser.add_argument("--flood-length", type=float, default=30.0)
+    parser.add_argument("--flood-lane", choices=["bulk", "interactive"], default="bulk")
+    parser.add_argument("--lanes", default="interactive:8,bulk:1")
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batch-overhead", type=float, default=0.1)
+    parser.add_argument("--per-order", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    layouts = [
+        ("fifo", parse_lanes("fifo:1"), 1),
+        ("lanes", parse_lanes(args.lanes), 1),
+        ("lanes+shards", parse_lanes(args.lanes), args.shards),
+    ]
+
+    print(
+        f"{'layout':<14} {'small p50':>10} {'small p99':>10} {'large p50':>10} "
+        f"{'large p99':>10} {'processed':>10} {'backlog':>8}"
+    )
+    for name, lanes, shards in layouts:
+        waits, backlog = simulate(args, lanes, shards)
+        small, large = waits["small"], waits["large"]
+        print(
+            f"{name:<14} {percentile(small, 0.5):>9.3f}s {percentile(small, 0.99):>9.3f}s "
+            f"{percentile(large, 0.5):>9.3f}s {percentile(large, 0.99):>9.3f}s "
+            f"{len(small) + len(large):>10} {backlog:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
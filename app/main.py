@@ -1,8 +1,9 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from .api.endpoints import orders
 from .api.endpoints import metrics
+from .api.endpoints import workers
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 
 # from .tasks.workers import start_workers
@@ -10,38 +11,99 @@ from .core.logging import logger
 from app.connections.database import db
 from app.core.workers.worker_manager import worker_manager
 from app.core.workers.order_processor import OrderProcessor, RedisOrderProcessor
+from app.core.workers.metrics_reconciler import MetricsReconciler
+from app.core.workers.autoscaler import OrderAutoscaler
 from app.core.config import settings
-from app.services.redis_service import redis_service
+from app.core import telemetry
+from app.services.redis_service import async_redis_service
+from app.services.catalog_cache import catalog_cache
+from app.services.order_events import order_event_hub
+from app.tasks.order_writer import order_writer
+import time
 import traceback
 
-app = FastAPI()
+# orjson encodes datetimes and enums natively and much faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
-@app.middleware("http")
-async def exception_middleware(request: Request, call_next):
+class ExceptionMiddleware:
     """
-    Middleware to handle exceptions globally and return appropriate error responses.
+    Handle exceptions globally and return appropriate error responses.
+
+    Plain ASGI rather than @app.middleware("http"): that wraps every response in
+    a StreamingResponse which reads `receive` while streaming, stealing the body
+    chunks POST /orders/bulk consumes while it sends results.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            traceback.print_exc()  # Log the full traceback for debugging
+            if started:
+                # Too late for an error response; the server closes the connection
+                raise
+            if isinstance(e, SQLAlchemyError):
+                content = {"error": "Database Error", "detail": str(e)}
+            else:
+                content = {"error": "Internal Server Error", "detail": str(e)}
+            await JSONResponse(status_code=500, content=content)(scope, receive, send)
+
+
+class MetricsMiddleware:
     """
-    try:
-        response = await call_next(request)
-        return response
-    except SQLAlchemyError as e:
-        traceback.print_exc()  # Log the full traceback for debugging
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Database Error", "detail": str(e)},
-        )
-    except Exception as e:
-        traceback.print_exc()  # Log the full traceback for debugging
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Internal Server Error", "detail": str(e)},
-        )
+    Count requests and time them per route template for Prometheus.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by the matched template (/orders/{order_id}) to keep cardinality bounded
+            route = scope.get("route")
+            route_path = route.path if route else "unmatched"
+            telemetry.REQUEST_LATENCY.labels(scope["method"], route_path).observe(
+                time.perf_counter() - started
+            )
+            telemetry.REQUEST_COUNT.labels(scope["method"], route_path, status_code).inc()
+
+
+# Added last, so metrics wrap the exception handling and see its 500s
+app.add_middleware(ExceptionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 # Include routers for handling different API endpoints
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(workers.router, prefix="/workers", tags=["workers"])
 
 
 @app.on_event("startup")
@@ -50,14 +112,24 @@ async def startup():
     Startup event handler to initialize the database, flush Redis, and start workers.
     """
     db.init_db()
-    redis_service.redis_conn.flushall()  # Clear all Redis data on startup
+    await async_redis_service.redis_conn.flushall()  # Clear all Redis data on startup
+    telemetry.reset_multiproc_dir()  # Drop Prometheus samples of processes that have exited
     await db.create_all()  # Create database tables if they do not exist
+    catalog_cache.start_listener()  # Drop cached catalog rows when another process writes them
+    order_event_hub.start_listener()  # Fan order status changes out to /orders/events streams
+    if settings.ORDER_WRITE_COALESCING:
+        order_writer.start()  # Groups concurrent POST /orders/ writes into shared commits
 
     # Initialize and start worker processes
     order_processor = OrderProcessor(num_processes=settings.WORKER_PROCESSES)
-    redis_order = RedisOrderProcessor(num_processes=settings.WORKER_PROCESSES)
     worker_manager.add_worker(order_processor)
-    worker_manager.add_worker(redis_order)
+    if settings.AUTOSCALE_ENABLED:
+        worker_manager.add_autoscaler(OrderAutoscaler(order_processor))
+    # Rebuilds the Redis order metrics from the database, starting right away
+    worker_manager.add_worker(MetricsReconciler())
+    if settings.ORDER_PIPELINE_RELAY:
+        redis_order = RedisOrderProcessor(num_processes=settings.WORKER_PROCESSES)
+        worker_manager.add_worker(redis_order)
     worker_manager.start_all()
 
 
@@ -66,5 +138,9 @@ async def shutdown():
     """
     Shutdown event handler to properly close the database connection and stop workers.
     """
+    await catalog_cache.stop_listener()
+    await order_event_hub.stop_listener()
+    await order_writer.stop()  # Writes the orders still waiting for a group commit
     await db.close()
+    await async_redis_service.close()
     worker_manager.stop_all()
@@ -1,3 +1,3 @@
 from .user import User
-from .order import Order
+from .order import Order, OrderLine
 from .items import Item
\ No newline at end of file
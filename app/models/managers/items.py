@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from ..items import Item
+from app.services.catalog_cache import catalog_cache
 
 class ItemManager:
     def __init__(self, session: AsyncSession):
@@ -31,6 +32,7 @@ class ItemManager:
                     if hasattr(item, key):
                         setattr(item, key, value)
                 await self.session.commit()
+                await catalog_cache.invalidate_items([item_id])
                 await self.session.refresh(item)
             return item
         except SQLAlchemyError as e:
@@ -48,6 +50,7 @@ class ItemManager:
                     if hasattr(item, key):
                         setattr(item, key, value)
             await self.session.commit()
+            await catalog_cache.invalidate_items(item_ids)
         except SQLAlchemyError as e:
             await self.session.rollback()
             raise e
@@ -58,6 +61,7 @@ class ItemManager:
             if item:
                 await self.session.delete(item)
                 await self.session.commit()
+                await catalog_cache.invalidate_items([item_id])
                 return True
             return False
         except SQLAlchemyError as e:
@@ -74,6 +78,7 @@ class ItemManager:
                 for item in items:
                     await self.session.delete(item)
                 await self.session.commit()
+                await catalog_cache.invalidate_items(item_ids)
                 return True
             return False
         except SQLAlchemyError as e:
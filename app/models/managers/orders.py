@@ -1,52 +1,205 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import func, insert, tuple_, update
 from ..items import Item
 from ..user import User
-from ..order import Order, OrderStatus, order_items
+from ..order import Order, OrderLine, OrderStatus, order_items
+from app.services.catalog_cache import catalog_cache
+from app.core.config import settings
 from datetime import datetime
+from collections import Counter
+
+# Columns returned by order listings; selecting them instead of Order entities keeps
+# streamed rows out of the session's identity map
+LISTING_COLUMNS = (
+    Order.order_id,
+    Order.user_id,
+    Order.total_amount,
+    Order.status,
+    Order.created_at,
+    Order.updated_at,
+    Order.completed_at,
+)
+
+# Loader for Order.lines in get_order_details. selectin issues a second IN query
+# for all the lines of the batch; joined fetches everything in one LEFT JOIN at the
+# cost of repeating order columns per line. Line items always ride along joined.
+DETAIL_LOADERS = {"selectin": selectinload, "joined": joinedload}
+
 
 class OrderManager:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create_order(self, order_id: str, user_id: str, items: list, total_amount: float) -> Order:
+    async def create_order(self, order_id: str, user_id: str, items: list, total_amount: float, idempotency_key: str = None) -> Order:
         try:
-            total_amount_org = 0
-            valid_items = []
-            user = await self.session.get(User, user_id)
+            if idempotency_key:
+                # A retry of a request whose order was already written gets that order back
+                existing = await self.get_orders_by_idempotency_key([idempotency_key])
+                if existing:
+                    return existing[idempotency_key]
 
-            if not user:
+            if not await self._existing_users([user_id]):
                 raise ValueError(f"Invalid user ID: {user_id}")
 
-            for item_id in items:
-                item = await self.session.get(Item, item_id)
-                if item:
-                    price_at_time = item.price
-                    total_amount_org += price_at_time
-                    valid_items.append({"item_id": item_id,"quantity":1, "price_at_time": price_at_time})
-                else:
-                    raise ValueError(f"Invalid item ID: {item_id}")
-            
-            if round(total_amount,1) != round(total_amount_org,1):
-                raise ValueError(f"Invalid  total_amount: org:{total_amount_org} your:{total_amount}")
-
-            new_order = Order(order_id=order_id, user_id=user_id, total_amount=total_amount_org, status=OrderStatus.PENDING)
-            self.session.add(new_order)
-            await self.session.commit()
-            await self.session.refresh(new_order)
+            # Repeated item IDs become a single line with a quantity
+            quantities = Counter(items)
+            prices = await self._get_item_prices(quantities)
+            total_amount_org, valid_items = self._price_order(order_id, quantities, total_amount, prices)
 
-            for item_data in valid_items:
-                await self.session.execute(order_items.insert().values(order_id=new_order.order_id, **item_data))
+            # Order and line items are written in one transaction
+            new_order = Order(order_id=order_id, user_id=user_id, total_amount=total_amount_org, status=OrderStatus.PENDING, idempotency_key=idempotency_key)
+            self.session.add(new_order)
+            await self.session.flush()
+            # An empty parameter list would insert one row of defaults
+            if valid_items:
+                await self.session.execute(order_items.insert(), valid_items)
             await self.session.commit()
             return new_order
         except (SQLAlchemyError, ValueError) as e:
             await self.session.rollback()
             raise e
 
+    async def create_orders(self, orders: list) -> list:
+        """
+        Validate and insert many (order_id, user_id, item_ids, total_amount, idempotency_key) orders in one transaction.
+
+        Users and items for the whole batch are looked up with one query each and
+        rows are written with chunked multi-row INSERTs. Returns one entry per
+        order, in order: the created order as a dict, or the ValueError that
+        rejected it. An order whose idempotency key was already used returns the
+        order written under that key instead. Database errors roll back the
+        whole batch and are raised.
+        """
+        keys = [order[4] for order in orders if order[4]]
+        existing = await self.get_orders_by_idempotency_key(keys) if keys else {}
+        existing = {key: _order_row(order) for key, order in existing.items()}
+        users = await self._existing_users({order[1] for order in orders})
+        quantities = [Counter(order[2]) for order in orders]
+        prices = await self._get_item_prices(
+            {item_id for counts in quantities for item_id in counts}
+        )
+
+        now = datetime.utcnow()
+        results, order_rows, item_rows = [], [], []
+        for (order_id, user_id, _, total_amount, idempotency_key), counts in zip(orders, quantities):
+            if idempotency_key in existing:
+                results.append(existing[idempotency_key])
+                continue
+            try:
+                if user_id not in users:
+                    raise ValueError(f"Invalid user ID: {user_id}")
+                total_amount_org, valid_items = self._price_order(order_id, counts, total_amount, prices)
+            except ValueError as e:
+                results.append(e)
+                continue
+            row = {
+                "order_id": order_id,
+                "user_id": user_id,
+                "total_amount": total_amount_org,
+                "status": OrderStatus.PENDING,
+                "created_at": now,
+                "updated_at": now,
+                "completed_at": None,
+                "idempotency_key": idempotency_key,
+            }
+            if idempotency_key:
+                # Repeats of the key later in this batch get this order
+                existing[idempotency_key] = row
+            order_rows.append(row)
+            item_rows.extend(valid_items)
+            results.append(row)
+
+        if not order_rows:
+            return results
+        try:
+            for chunk in _chunks(order_rows, settings.BULK_INSERT_CHUNK_SIZE):
+                await self.session.execute(insert(Order).values(chunk))
+            for chunk in _chunks(item_rows, settings.BULK_INSERT_CHUNK_SIZE):
+                await self.session.execute(order_items.insert().values(chunk))
+            await self.session.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return results
+
+    @staticmethod
+    def _price_order(order_id: str, quantities: Counter, total_amount: float, prices: dict):
+        """Check the items and client total of one order; returns the real total and its order_items rows."""
+        total_amount_org = 0
+        valid_items = []
+        for item_id, quantity in quantities.items():
+            if item_id not in prices:
+                raise ValueError(f"Invalid item ID: {item_id}")
+            price_at_time = prices[item_id]
+            total_amount_org += price_at_time * quantity
+            valid_items.append({"order_id": order_id, "item_id": item_id, "quantity": quantity, "price_at_time": price_at_time})
+
+        if round(total_amount,1) != round(total_amount_org,1):
+            raise ValueError(f"Invalid  total_amount: org:{total_amount_org} your:{total_amount}")
+        return total_amount_org, valid_items
+
+    async def _existing_users(self, user_ids) -> set:
+        """Return which of `user_ids` exist, reading only cache misses from the database."""
+        found = catalog_cache.get_users(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            generation = catalog_cache.generation
+            result = await self.session.execute(
+                select(User.id, User.is_active).where(User.id.in_(missing))
+            )
+            fetched = dict(result.all())
+            catalog_cache.set_users(fetched, generation)
+            found.update(fetched)
+        return set(found)
+
+    async def _get_item_prices(self, item_ids) -> dict:
+        """Map each existing, active item ID to its price, reading only cache misses from the database."""
+        items = catalog_cache.get_items(item_ids)
+        missing = [item_id for item_id in item_ids if item_id not in items]
+        if missing:
+            generation = catalog_cache.generation
+            result = await self.session.execute(
+                select(Item.id, Item.price, Item.is_active).where(Item.id.in_(missing))
+            )
+            fetched = {row.id: (row.price, row.is_active) for row in result}
+            catalog_cache.set_items(fetched, generation)
+            items.update(fetched)
+        # Inactive items are left out, so ordering them fails like an unknown ID
+        return {item_id: price for item_id, (price, is_active) in items.items() if is_active}
+
     async def get_order(self, order_id: str) -> Order:
         return await self.session.get(Order, order_id)
 
+    async def get_orders(self, order_ids: list) -> list:
+        result = await self.session.execute(
+            select(Order).where(Order.order_id.in_(order_ids))
+        )
+        return result.scalars().all()
+
+    async def get_order_details(self, order_ids: list, strategy: str = "selectin") -> list:
+        """
+        Orders with their lines (quantity, price_at_time and item) loaded, in at most two queries.
+
+        `strategy` picks the loader for the lines, see DETAIL_LOADERS.
+        """
+        loader = DETAIL_LOADERS[strategy]
+        result = await self.session.execute(
+            select(Order)
+            .where(Order.order_id.in_(order_ids))
+            .options(loader(Order.lines).joinedload(OrderLine.item))
+        )
+        return result.unique().scalars().all()
+
+    async def get_orders_by_idempotency_key(self, keys: list) -> dict:
+        """Map each of `keys` that was already used to the order created with it."""
+        result = await self.session.execute(
+            select(Order).where(Order.idempotency_key.in_(keys))
+        )
+        return {order.idempotency_key: order for order in result.scalars()}
+
     async def update_order(self, order_id: str, **kwargs) -> Order:
         try:
             order = await self.session.get(Order, order_id)
@@ -61,25 +214,100 @@ class OrderManager:
             await self.session.rollback()
             raise e
         
-    async def update_bulk_orders(self, order_ids: list, **kwargs) -> Order:
+    def _bulk_update_query(self, order_ids: list, expected_status: OrderStatus, kwargs: dict):
+        now = datetime.utcnow()
+        values = {key: value for key, value in kwargs.items() if hasattr(Order, key)}
+        values.setdefault("updated_at", now)
+        if values.get("status") == OrderStatus.COMPLETED:
+            values.setdefault("completed_at", now)
+
+        query = (
+            update(Order)
+            .where(Order.order_id.in_(order_ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if expected_status is not None:
+            query = query.where(Order.status == expected_status)
+        return query
+
+    async def update_bulk_orders(self, order_ids: list, expected_status: OrderStatus = None, **kwargs) -> int:
+        """
+        Apply `kwargs` to all `order_ids` in a single UPDATE and return the number of rows changed.
+
+        When `expected_status` is given only orders currently in that status are
+        updated, so a redelivered batch cannot move an order backwards.
+        """
+        if not order_ids:
+            return 0
         try:
-            orders_result = await self.session.execute(
-                select(Order).where(Order.order_id.in_(order_ids))
+            result = await self.session.execute(
+                self._bulk_update_query(order_ids, expected_status, kwargs)
             )
-            orders = orders_result.scalars().all()
-            if orders:
-                for order in orders:
-                    for key, value in kwargs.items():
-                        if hasattr(order, key):
-                            setattr(order, key, value)
-                        if key == "status" and value == OrderStatus.COMPLETED:
-                            setattr(order, "completed_at", datetime.now())
-                            
-                await self.session.commit()
+            await self.session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+
+    async def transition_orders(self, order_ids: list, from_status: OrderStatus, to_status: OrderStatus) -> int:
+        """Move orders that are still in `from_status` to `to_status`; returns the number moved."""
+        return await self.update_bulk_orders(order_ids, expected_status=from_status, status=to_status)
+
+    async def start_orders(self, order_ids: list) -> list:
+        """Move PENDING orders to PROCESSING and return (order_id, updated_at) for each one moved."""
+        if not order_ids:
+            return []
+        try:
+            query = self._bulk_update_query(
+                order_ids, OrderStatus.PENDING, {"status": OrderStatus.PROCESSING}
+            ).returning(Order.order_id, Order.updated_at)
+            result = await self.session.execute(query)
+            rows = result.all()
+            await self.session.commit()
+            return rows
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+
+    async def complete_orders(self, order_ids: list) -> list:
+        """Move PROCESSING orders to COMPLETED and return (order_id, created_at, completed_at) for each one moved."""
+        if not order_ids:
+            return []
+        try:
+            query = self._bulk_update_query(
+                order_ids, OrderStatus.PROCESSING, {"status": OrderStatus.COMPLETED}
+            ).returning(Order.order_id, Order.created_at, Order.completed_at)
+            result = await self.session.execute(query)
+            rows = result.all()
+            await self.session.commit()
+            return rows
         except SQLAlchemyError as e:
             await self.session.rollback()
             raise e
 
+    async def get_status_summary(self) -> dict:
+        """Count orders per status and total the processing time of completed orders."""
+        if self.session.bind.dialect.name == "sqlite":
+            duration = (func.julianday(Order.completed_at) - func.julianday(Order.created_at)) * 86400
+        else:
+            duration = func.extract("epoch", Order.completed_at - Order.created_at)
+
+        status_result = await self.session.execute(
+            select(Order.status, func.count()).group_by(Order.status)
+        )
+        duration_result = await self.session.execute(
+            select(func.coalesce(func.sum(duration), 0), func.count()).where(
+                Order.status == OrderStatus.COMPLETED
+            )
+        )
+        duration_sum, duration_count = duration_result.one()
+        return {
+            "status_counts": dict(status_result.all()),
+            "duration_sum": float(duration_sum),
+            "duration_count": duration_count,
+        }
+
     async def delete_order(self, order_id: str) -> bool:
         try:
             order = await self.session.get(Order, order_id)
@@ -92,9 +320,51 @@ class OrderManager:
             await self.session.rollback()
             raise e
 
+    def _listing_query(self, status=None, user_id=None, created_from=None, created_to=None, after=None):
+        """Orders matching the filters in (created_at, order_id) order, starting after the `after` key."""
+        query = select(*LISTING_COLUMNS).order_by(Order.created_at, Order.order_id)
+        if status:
+            query = query.where(Order.status == status)
+        if user_id:
+            query = query.where(Order.user_id == user_id)
+        if created_from:
+            query = query.where(Order.created_at >= created_from)
+        if created_to:
+            query = query.where(Order.created_at < created_to)
+        if after:
+            # Keyset pagination: seek past the last row seen instead of OFFSET
+            query = query.where(tuple_(Order.created_at, Order.order_id) > tuple_(*after))
+        return query
+
+    async def list_orders(self, limit: int, **filters) -> list:
+        """
+        One page of orders as rows of LISTING_COLUMNS.
+
+        Pass the (created_at, order_id) of the previous page's last row as `after`
+        to get the next page; see _listing_query for the filters.
+        """
+        result = await self.session.execute(self._listing_query(**filters).limit(limit))
+        return result.all()
+
+    async def stream_orders(self, chunk_size: int = 1000, **filters):
+        """Yield every matching order row from a server-side cursor, `chunk_size` rows at a time."""
+        query = self._listing_query(**filters).execution_options(yield_per=chunk_size)
+        result = await self.session.stream(query)
+        async for row in result:
+            yield row
+
     async def get_all_orders(self, status: str = None):
         query = select(Order)
         if status:
             query = query.where(Order.status == status)
         result = await self.session.execute(query)
         return result.scalars().all()
+
+
+def _chunks(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _order_row(order: Order) -> dict:
+    return {column.name: getattr(order, column.name) for column in Order.__table__.columns}
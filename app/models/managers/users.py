@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from ..user import User
+from app.services.catalog_cache import catalog_cache
 
 class UserManager:
     def __init__(self, session: AsyncSession):
@@ -31,6 +32,7 @@ class UserManager:
                     if hasattr(user, key):
                         setattr(user, key, value)
                 await self.session.commit()
+                await catalog_cache.invalidate_users([user_id])
                 await self.session.refresh(user)
             return user
         except SQLAlchemyError as e:
@@ -48,6 +50,7 @@ class UserManager:
                     if hasattr(user, key):
                         setattr(user, key, value)
             await self.session.commit()
+            await catalog_cache.invalidate_users(user_ids)
         except SQLAlchemyError as e:
             await self.session.rollback()
             raise e
@@ -58,6 +61,7 @@ class UserManager:
             if user:
                 await self.session.delete(user)
                 await self.session.commit()
+                await catalog_cache.invalidate_users([user_id])
                 return True
             return False
         except SQLAlchemyError as e:
@@ -74,6 +78,7 @@ class UserManager:
                 for user in users:
                     await self.session.delete(user)
                 await self.session.commit()
+                await catalog_cache.invalidate_users(user_ids)
                 return True
             return False
         except SQLAlchemyError as e:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Enum, ForeignKey, Table, Integer, DateTime
+from sqlalchemy import Column, String, Float, Enum, ForeignKey, Table, Integer, DateTime, Index
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from app.connections.database import db
@@ -21,6 +21,7 @@ order_items = Table(
     Column("item_id", String(36), ForeignKey("item.id")),
     Column("quantity", Integer, default=1),
     Column("price_at_time", Float),  # Store price at time of order
+    Index("ix_order_items_order_id", "order_id"),
 )
 
 
@@ -28,12 +29,48 @@ class Order(BaseModel, db.Base):
     """Model representing an order placed by a user."""
 
     __tablename__ = "orders"
+    __table_args__ = (
+        # Status listings and the per-status counts in /metrics/
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        # Covers the completed-order duration query, which reads only these columns
+        Index("ix_orders_status_completed_at", "status", "completed_at", "created_at"),
+        Index("ux_orders_idempotency_key", "idempotency_key", unique=True),
+        # Keyset pagination of GET /orders/, unfiltered and per user
+        Index("ix_orders_created_at_order_id", "created_at", "order_id"),
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "order_id"),
+    )
 
     id = None
     order_id = Column(String, primary_key=True)
     user_id = Column(String(36), ForeignKey("users.id"), index=True)
-    user = relationship("User", backref="orders")
-    items = relationship("Item", secondary=order_items, backref="orders")
+    # Lazy loading cannot work in an async session, so these fail loudly unless a
+    # query asks for them; see OrderManager.get_order_details
+    user = relationship("User", backref="orders", lazy="raise")
+    items = relationship("Item", secondary=order_items, backref="orders", lazy="raise")
+    lines = relationship("OrderLine", viewonly=True, lazy="raise")
     total_amount = Column(Float)
-    status = Column(String, default=OrderStatus.PENDING)
+    status = Column(
+        Enum(
+            OrderStatus,
+            name="order_status",
+            values_callable=lambda statuses: [status.value for status in statuses],
+        ),
+        default=OrderStatus.PENDING,
+    )
     completed_at = Column(DateTime, nullable=True)
+    # Client-supplied Idempotency-Key; the unique index stops retries from creating duplicates
+    idempotency_key = Column(String(255), nullable=True)
+
+
+class OrderLine(db.Base):
+    """One row of order_items: an item on an order with its quantity and price at the time."""
+
+    __table__ = order_items
+    # order_items has no primary key of its own; an item appears once per order
+    __mapper_args__ = {"primary_key": [order_items.c.order_id, order_items.c.item_id]}
+
+    item = relationship("Item", viewonly=True, lazy="raise")
+
+    @property
+    def name(self) -> str:
+        return self.item.name
@@ -1,8 +1,42 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from datetime import datetime
+from app.models.order import OrderStatus
 
 
 class OrderCreate(BaseModel):
     user_id: str
     item_ids: List[str]
     total_amount: float
+
+
+class OrderResponse(BaseModel):
+    """The columns an order endpoint returns; read straight from Order attributes or rows."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    order_id: str
+    user_id: str
+    total_amount: float
+    status: OrderStatus
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class OrderLineResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    item_id: str
+    name: str
+    quantity: int
+    price_at_time: float
+
+
+class OrderDetailResponse(OrderResponse):
+    lines: List[OrderLineResponse]
+
+
+class OrderPage(BaseModel):
+    orders: List[OrderResponse]
+    next_cursor: Optional[str] = None
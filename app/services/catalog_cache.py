@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from ..core.config import settings
+from .redis_service import ChannelListener, async_redis_service
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Every API process listens here and drops the entries named in each message
+INVALIDATION_CHANNEL = "catalog_invalidation"
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get_many(self, keys):
+        """Return the live entries among `keys`, marking them as recently used."""
+        now = time.monotonic()
+        found = {}
+        for key in keys:
+            entry = self._data.get(key)
+            if entry is None:
+                continue
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                continue
+            self._data.move_to_end(key)
+            found[key] = value
+        return found
+
+    def set_many(self, values: dict):
+        expires_at = time.monotonic() + self.ttl
+        for key, value in values.items():
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+        # Evict least recently used entries beyond the size limit
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def discard_many(self, keys):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class CatalogCache:
+    """
+    In-process read-through cache for item prices/active status and user existence.
+
+    Only rows that exist are cached. Writes through ItemManager and UserManager
+    evict the affected entries locally and broadcast the eviction over Redis
+    pub/sub so every API process drops them too.
+    """
+
+    def __init__(self):
+        self.items = TTLCache(settings.CATALOG_CACHE_MAX_ITEMS, settings.CATALOG_CACHE_TTL)
+        self.users = TTLCache(settings.CATALOG_CACHE_MAX_USERS, settings.CATALOG_CACHE_TTL)
+        # Bumped on every eviction; a read-through fill started before an
+        # eviction is discarded so it cannot re-insert stale rows
+        self.generation = 0
+        # Invalidations published while the listener was not subscribed are lost,
+        # so every (re)subscription starts from an empty cache
+        self._listener = ChannelListener(
+            INVALIDATION_CHANNEL,
+            lambda payload: self._evict(payload["kind"], payload["ids"]),
+            on_subscribe=self.clear,
+        )
+
+    def get_items(self, item_ids) -> dict:
+        """Map each cached item ID to its (price, is_active) tuple."""
+        return self.items.get_many(item_ids)
+
+    def set_items(self, items: dict, generation: int):
+        if generation == self.generation:
+            self.items.set_many(items)
+
+    def get_users(self, user_ids) -> dict:
+        """Map each cached user ID to its is_active flag."""
+        return self.users.get_many(user_ids)
+
+    def set_users(self, users: dict, generation: int):
+        if generation == self.generation:
+            self.users.set_many(users)
+
+    async def invalidate_items(self, item_ids):
+        await self._invalidate("item", list(item_ids))
+
+    async def invalidate_users(self, user_ids):
+        await self._invalidate("user", list(user_ids))
+
+    async def _invalidate(self, kind: str, ids: list):
+        self._evict(kind, ids)
+        try:
+            await async_redis_service.redis_conn.publish(
+                INVALIDATION_CHANNEL, json.dumps({"kind": kind, "ids": ids})
+            )
+        except Exception as e:
+            # Other processes fall back to the TTL for this write
+            logger.warning(f"Failed to broadcast {kind} cache invalidation: {e}")
+
+    def _evict(self, kind: str, ids: list):
+        self.generation += 1
+        cache = self.items if kind == "item" else self.users
+        cache.discard_many(ids)
+
+    def clear(self):
+        self.generation += 1
+        self.items.clear()
+        self.users.clear()
+
+    def start_listener(self):
+        """Start consuming invalidations published by other processes."""
+        self._listener.start()
+
+    async def stop_listener(self):
+        await self._listener.stop()
+
+
+# Global catalog cache instance
+catalog_cache = CatalogCache()
@@ -0,0 +1,37 @@
+from ..core.config import settings
+
+# Redis side of Idempotency-Key handling for POST /orders/. The key is reserved
+# with SET NX for at most IDEMPOTENCY_CLAIM_TTL while the first request runs, then
+# holds that request's response body until IDEMPOTENCY_TTL expires, so retries are
+# answered from Redis alone.
+IDEMPOTENCY_PREFIX = "idempotency:"
+IN_PROGRESS = b"in-progress"
+
+
+async def claim(redis_conn, key: str):
+    """
+    Reserve `key` for this request.
+
+    Returns None when the caller now owns the key and should create the order,
+    IN_PROGRESS while another request with the key is still running, or the
+    stored JSON response of the request that used it first.
+    """
+    redis_key = IDEMPOTENCY_PREFIX + key
+    # A second round covers the stored value expiring between SET and GET
+    for _ in range(2):
+        if await redis_conn.set(redis_key, IN_PROGRESS, nx=True, ex=settings.IDEMPOTENCY_CLAIM_TTL):
+            return None
+        stored = await redis_conn.get(redis_key)
+        if stored is not None:
+            return stored
+    return None
+
+
+async def store(redis_conn, key: str, body: bytes):
+    """Keep the JSON response body of the request that owns `key` for its retries."""
+    await redis_conn.set(IDEMPOTENCY_PREFIX + key, body, ex=settings.IDEMPOTENCY_TTL)
+
+
+async def release(redis_conn, key: str):
+    """Give up `key` after a request that did not store its response, so a retry can try again."""
+    await redis_conn.delete(IDEMPOTENCY_PREFIX + key)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from ..core.config import settings
+import math
+import time
+
+# Log-bucketed histograms in the style of DDSketch: every value lands in a bucket
+# whose bounds are within RELATIVE_ACCURACY of it, so percentiles keep that
+# relative error and histograms from any process or time slice merge by adding counts.
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+MIN_SECONDS = 1e-6
+
+LATENCY_PREFIX = "latency:"
+METRICS = ("queue_wait", "processing", "end_to_end")
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p999": 0.999}
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+
+def bucket_index(seconds: float) -> int:
+    return math.ceil(math.log(max(seconds, MIN_SECONDS)) / _LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket, within RELATIVE_ACCURACY of anything in it."""
+    return 2 * _GAMMA**index / (_GAMMA + 1)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+
+    def add(self, index: int, count: int = 1):
+        self.counts[index] += count
+        self.total += count
+
+    def percentile(self, quantile: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = quantile * (self.total - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return bucket_value(index)
+        return bucket_value(max(self.counts))
+
+    def summary(self) -> dict:
+        result = {"count": self.total}
+        result.update({name: self.percentile(q) for name, q in QUANTILES.items()})
+        return result
+
+
+def _slice(timestamp: float) -> int:
+    return int(timestamp // settings.LATENCY_SLICE_SECONDS)
+
+
+class LatencyRecorder:
+    """
+    Collects latencies in the worker process and flushes them to Redis.
+
+    Each flush adds the bucket counts to this process's own fields,
+    <source>|<metric>:<bucket>, in the hash of the current time slice. The
+    per-process histograms stay apart in Redis, yet readers still fetch one
+    hash per slice however many workers there are, and merge them by adding.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._pending = defaultdict(int)
+
+    def record(self, metric: str, seconds: float):
+        # Hot path: one log and one dict update
+        self._pending[(metric, bucket_index(seconds))] += 1
+
+    def flush(self, pipe):
+        """Queue the collected counts on a (sync) Redis pipeline and reset them."""
+        if not self._pending:
+            return
+        slice_key = f"{LATENCY_PREFIX}{_slice(time.time())}"
+        for (metric, index), count in self._pending.items():
+            pipe.hincrby(slice_key, f"{self.source}|{metric}:{index}", count)
+        pipe.expire(slice_key, max(WINDOWS.values()) + settings.LATENCY_SLICE_SECONDS)
+        self._pending.clear()
+
+
+# (expires at, result) of the last read_latency_percentiles in this process
+_cached = (0.0, None)
+
+
+async def read_latency_percentiles(redis_conn) -> dict:
+    """
+    Merge the histograms over each sliding window and summarize them.
+
+    Costs one pipelined round-trip of a fixed number of slice reads, and is
+    served from memory for LATENCY_CACHE_SECONDS after that, so frequent
+    polling does not multiply the reads.
+    """
+    global _cached
+    expires_at, result = _cached
+    if result is not None and time.monotonic() < expires_at:
+        return result
+
+    current = _slice(time.time())
+    slice_count = max(WINDOWS.values()) // settings.LATENCY_SLICE_SECONDS
+    slices = [current - offset for offset in range(slice_count)]
+
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for slice_id in slices:
+            pipe.hgetall(f"{LATENCY_PREFIX}{slice_id}")
+        buckets = await pipe.execute()
+
+    result = {}
+    for window, seconds in WINDOWS.items():
+        oldest = current - seconds // settings.LATENCY_SLICE_SECONDS
+        histograms = {metric: LatencyHistogram() for metric in METRICS}
+        for slice_id, counts in zip(slices, buckets):
+            if slice_id <= oldest:
+                continue
+            for field, count in counts.items():
+                # Merges the per-process histograms; the source precedes the "|"
+                metric, index = field.decode().rsplit("|", 1)[-1].rsplit(":", 1)
+                # Per-lane queue waits are recorded as queue_wait:<lane>
+                if metric not in histograms and metric.split(":", 1)[0] in METRICS:
+                    histograms[metric] = LatencyHistogram()
+                if metric in histograms:
+                    histograms[metric].add(int(index), int(count))
+        result[window] = {
+            metric: histogram.summary() for metric, histogram in histograms.items()
+        }
+    _cached = (time.monotonic() + settings.LATENCY_CACHE_SECONDS, result)
+    return result
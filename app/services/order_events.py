@@ -0,0 +1,112 @@
+from .redis_service import ChannelListener
+from ..core.config import settings
+from app.models.order import OrderStatus
+from collections import defaultdict
+import asyncio
+import json
+
+# Workers publish one message per batch transition on this channel; every API
+# process holds a single subscription and fans the events out to its own clients.
+ORDER_EVENTS_CHANNEL = "order_status_events"
+
+
+def publish_transition(pipe, order_ids, status: OrderStatus, updated_at):
+    """Queue the publication of a batch transition on a (sync or asyncio) pipeline."""
+    pipe.publish(
+        ORDER_EVENTS_CHANNEL,
+        json.dumps(
+            {
+                "order_ids": list(order_ids),
+                "status": status.value,
+                "updated_at": updated_at.isoformat(),
+            }
+        ),
+    )
+
+
+class OrderEventSubscription:
+    """
+    The events one client has not been sent yet, at most one per watched order.
+
+    A newer status replaces the one still waiting for the same order, so a slow
+    client, or a batch completing every watched order at once, loses nothing but
+    superseded statuses.
+    """
+
+    def __init__(self, order_ids):
+        self.order_ids = order_ids
+        self._latest = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, event: dict):
+        self._latest[event["order_id"]] = event
+        self._ready.set()
+
+    async def get(self, timeout: float) -> list:
+        """Wait up to `timeout` seconds for events and return them all; [] on timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events = list(self._latest.values())
+        self._latest.clear()
+        return events
+
+
+class OrderEventHub:
+    """Routes order status events from Redis pub/sub to the subscribers in this process."""
+
+    def __init__(self):
+        # order_id -> subscriptions watching it
+        self._subscribers = defaultdict(set)
+        self.subscriber_count = 0
+        # Events published while it is not subscribed are lost; clients still see
+        # the final status in the snapshot they get on (re)connecting
+        self._listener = ChannelListener(ORDER_EVENTS_CHANNEL, self.dispatch)
+
+    def subscribe(self, order_ids):
+        """Return a new subscription, or None when ORDER_EVENTS_MAX_SUBSCRIBERS are already subscribed."""
+        # Checked and counted without awaiting in between, so concurrent callers cannot overshoot
+        if self.subscriber_count >= settings.ORDER_EVENTS_MAX_SUBSCRIBERS:
+            return None
+        subscription = OrderEventSubscription(order_ids)
+        for order_id in order_ids:
+            self._subscribers[order_id].add(subscription)
+        self.subscriber_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: OrderEventSubscription):
+        for order_id in subscription.order_ids:
+            watchers = self._subscribers.get(order_id)
+            if watchers is None:
+                continue
+            watchers.discard(subscription)
+            if not watchers:
+                del self._subscribers[order_id]
+        self.subscriber_count -= 1
+
+    def dispatch(self, payload: dict):
+        """Deliver one published transition to every local subscriber of its orders."""
+        for order_id in payload["order_ids"]:
+            watchers = self._subscribers.get(order_id)
+            if not watchers:
+                continue
+            event = {
+                "order_id": order_id,
+                "status": payload["status"],
+                "updated_at": payload["updated_at"],
+            }
+            for subscription in watchers:
+                subscription.offer(event)
+
+    def start_listener(self):
+        """Start consuming the events published by the workers."""
+        self._listener.start()
+
+    async def stop_listener(self):
+        await self._listener.stop()
+
+
+# Global order event hub instance
+order_event_hub = OrderEventHub()
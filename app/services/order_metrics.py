@@ -0,0 +1,50 @@
+from app.models.order import OrderStatus
+
+# Hash holding one counter per order status plus the running processing-time totals.
+# Updated incrementally as orders change state, and periodically overwritten from
+# the database by MetricsReconciler to correct any drift. The writers below only add
+# commands to the pipeline they are given: asyncio in the API, sync in the workers.
+METRICS_KEY = "order_metrics"
+DURATION_SUM = "duration_sum"
+DURATION_COUNT = "duration_count"
+
+
+def record_created(pipe, count: int = 1):
+    pipe.hincrby(METRICS_KEY, OrderStatus.PENDING.value, count)
+
+
+def record_transition(pipe, from_status: OrderStatus, to_status: OrderStatus, count: int):
+    if count:
+        pipe.hincrby(METRICS_KEY, from_status.value, -count)
+        pipe.hincrby(METRICS_KEY, to_status.value, count)
+
+
+def record_durations(pipe, durations: list):
+    """Add the processing times (in seconds) of newly completed orders."""
+    if durations:
+        pipe.hincrbyfloat(METRICS_KEY, DURATION_SUM, sum(durations))
+        pipe.hincrby(METRICS_KEY, DURATION_COUNT, len(durations))
+
+
+def replace_metrics(pipe, summary: dict):
+    """Overwrite the counters with a summary from OrderManager.get_status_summary."""
+    mapping = {status.value: summary["status_counts"].get(status, 0) for status in OrderStatus}
+    mapping[DURATION_SUM] = summary["duration_sum"]
+    mapping[DURATION_COUNT] = summary["duration_count"]
+    pipe.delete(METRICS_KEY)
+    pipe.hset(METRICS_KEY, mapping=mapping)
+
+
+def parse_metrics(raw: dict) -> dict:
+    """Turn the raw hash from HGETALL into the /metrics/ response."""
+    values = {key.decode(): value.decode() for key, value in raw.items()}
+    duration_count = int(values.get(DURATION_COUNT, 0))
+    duration_sum = float(values.get(DURATION_SUM, 0))
+    return {
+        "average_processing_time_seconds": (
+            duration_sum / duration_count if duration_count else 0
+        ),
+        "order_status_counts": {
+            status.value: int(values.get(status.value, 0)) for status in OrderStatus
+        },
+    }
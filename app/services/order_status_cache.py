@@ -0,0 +1,93 @@
+from ..core.config import settings
+from app.models.order import OrderStatus
+
+# One small hash per order with what GET /orders/{order_id} returns, so status
+# polls are answered from Redis. Creation and every status transition write
+# through to it; a database read only fills fields that are missing, so a fill
+# racing a transition can never put an older status back. Writes go on the caller's
+# pipeline, whether that is the API's asyncio one or a worker's sync one.
+ORDER_STATUS_PREFIX = "order_status:"
+FIELDS = ("user_id", "total_amount", "status", "created_at", "updated_at", "completed_at")
+
+
+def _key(order_id: str) -> str:
+    return f"{ORDER_STATUS_PREFIX}{order_id}"
+
+
+def field_values(order) -> dict:
+    """Hash fields for an Order or an order row dict."""
+    get = order.get if isinstance(order, dict) else lambda name: getattr(order, name)
+    values = {}
+    for name in FIELDS:
+        value = get(name)
+        if isinstance(value, OrderStatus):
+            value = value.value
+        elif hasattr(value, "isoformat"):
+            value = value.isoformat()
+        values[name] = "" if value is None else value
+    return values
+
+
+def cache_orders(pipe, orders):
+    """Write the full status hash of newly created orders."""
+    for order in orders:
+        key = _key(get_order_id(order))
+        pipe.hset(key, mapping=field_values(order))
+        pipe.expire(key, settings.ORDER_STATUS_CACHE_TTL)
+
+
+def fill_order(pipe, order):
+    """Fill the hash from a database read without overwriting fields a transition already wrote."""
+    key = _key(get_order_id(order))
+    for name, value in field_values(order).items():
+        pipe.hsetnx(key, name, value)
+    pipe.expire(key, settings.ORDER_STATUS_CACHE_TTL)
+
+
+def record_status(pipe, order_ids, status: OrderStatus, updated_at, completed_at=None):
+    """Write a status transition through to each order's hash."""
+    values = {"status": status.value, "updated_at": updated_at.isoformat()}
+    if completed_at is not None:
+        values["completed_at"] = completed_at.isoformat()
+    for order_id in order_ids:
+        key = _key(order_id)
+        pipe.hset(key, mapping=values)
+        pipe.expire(key, settings.ORDER_STATUS_CACHE_TTL)
+
+
+def get_order_id(order) -> str:
+    return order["order_id"] if isinstance(order, dict) else order.order_id
+
+
+def to_response(order_id: str, values: dict) -> dict:
+    """Build the GET /orders/{order_id} body from the hash fields."""
+    return {
+        "order_id": order_id,
+        "user_id": values["user_id"],
+        "total_amount": float(values["total_amount"]),
+        "status": values["status"],
+        "created_at": values["created_at"],
+        "updated_at": values["updated_at"] or None,
+        "completed_at": values["completed_at"] or None,
+    }
+
+
+async def read_order(redis_conn, order_id: str):
+    """Return the cached GET /orders/{order_id} body, or None when the hash is missing or partial."""
+    return _parse(order_id, await redis_conn.hgetall(_key(order_id)))
+
+
+async def read_orders(redis_conn, order_ids) -> dict:
+    """Like read_order for many orders in one round-trip; maps each ID to its body or None."""
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for order_id in order_ids:
+            pipe.hgetall(_key(order_id))
+        hashes = await pipe.execute()
+    return {order_id: _parse(order_id, raw) for order_id, raw in zip(order_ids, hashes)}
+
+
+def _parse(order_id: str, raw: dict):
+    values = {name.decode(): value.decode() for name, value in raw.items()}
+    if any(name not in values for name in FIELDS):
+        return None
+    return to_response(order_id, values)
@@ -0,0 +1,61 @@
+from collections import namedtuple
+import json
+
+import msgpack
+
+# Queue entries are small msgpack arrays:
+#   [version, order ID, enqueue time, priority lane, user_id shard]
+# IDs of the form ORD-<32 hex digits> travel as their 16 raw UUID bytes, so an
+# entry takes 31 bytes where the JSON relay payload took 52 and the plain ID 36 plus
+# a field in the enqueue-time hash. Any other ID is carried as a string.
+# Version 1 entries have no lane or shard.
+ENVELOPE_VERSION = 2
+ORDER_ID_PREFIX = "ORD-"
+# msgpack fixarray headers of the version 1 and version 2 layouts
+_HEADERS = {b"\x93": 1, b"\x95": 2}
+
+QueueEntry = namedtuple("QueueEntry", ["order_id", "enqueued_at", "lane", "shard"])
+
+
+def encode(order_id: str, enqueued_at: float, lane: int, shard: int) -> bytes:
+    """Pack one order ID, its epoch enqueue time, lane index and shard into a queue entry."""
+    return msgpack.packb([ENVELOPE_VERSION, _pack_id(order_id), enqueued_at, lane, shard])
+
+
+def decode(payload: bytes) -> QueueEntry:
+    """
+    Unpack a queue entry.
+
+    Entries written before the envelope existed are still accepted during a
+    rollout: the JSON relay payload {"order_id": ...} and the bare order ID.
+    Neither carries an enqueue time or a lane, so those come back as None.
+    """
+    if payload[:1] == b"{":
+        return QueueEntry(json.loads(payload)["order_id"], None, None, 0)
+    if payload[:1] not in _HEADERS:
+        # Not a msgpack envelope, so a bare ID
+        return QueueEntry(payload.decode(), None, None, 0)
+    fields = msgpack.unpackb(payload)
+    if fields[0] != _HEADERS[payload[:1]]:
+        raise ValueError(f"Unsupported queue envelope version {fields[0]}")
+    if fields[0] == 1:
+        return QueueEntry(_unpack_id(fields[1]), fields[2], None, 0)
+    return QueueEntry(_unpack_id(fields[1]), fields[2], fields[3], fields[4])
+
+
+def _pack_id(order_id: str):
+    if order_id.startswith(ORDER_ID_PREFIX) and len(order_id) == 36:
+        try:
+            packed = bytes.fromhex(order_id[4:])
+        except ValueError:
+            return order_id
+        # Only IDs that unpack to exactly the same string (lowercase hex) are packed
+        if packed.hex() == order_id[4:]:
+            return packed
+    return order_id
+
+
+def _unpack_id(packed_id) -> str:
+    if isinstance(packed_id, bytes):
+        return ORDER_ID_PREFIX + packed_id.hex()
+    return packed_id
@@ -1,41 +1,437 @@
 from redis import Redis
+from redis.asyncio import BlockingConnectionPool, Redis as AsyncRedis
+from redis.exceptions import RedisError
 from rq import Queue
 from ..core.config import settings
+from . import queue_codec
+from collections import defaultdict
+import asyncio
+import json
+import logging
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Orders pushed back after a failed or orphaned batch, served before every lane.
+# Entries queued before the lanes existed drain from here as well.
+ORDER_QUEUE = "order_queue"
+RETRY_LANE = "retry"
+# One list per (lane, user_id shard) at LANE_PREFIX<lane>:<shard>, plus a ring of
+# the lane's non-empty shards at LANE_PREFIX<lane>:active for round-robin
+LANE_PREFIX = "order_queue:lane:"
+# Orders queued in each lane, by lane index
+LANE_DEPTH = "order_queue:depth"
+# Holds a single token while orders are queued; idle workers block on it
+DOORBELL = "order_queue:doorbell"
+PROCESSING_PREFIX = "order_queue:processing:"
+HEARTBEAT_PREFIX = "order_queue:heartbeat:"
+# Entries no worker can decode, kept for inspection instead of being retried forever
+DEAD_LETTER = "order_queue:dead"
+# Enqueue times of orders queued as bare IDs before the queue envelope; new
+# entries carry their enqueue time and this hash only drains during a rollout
+ENQUEUED_AT = "order_queue:enqueued_at"
+# Running count of enqueued orders, used to derive the arrival rate
+ENQUEUED_TOTAL = "order_queue:enqueued_total"
+
+# Entries passed to one ENQUEUE_SCRIPT call; unpack() is bounded by the Lua stack
+ENQUEUE_CHUNK_SIZE = 1000
+
+# Append ARGV[3..] to the shard list KEYS[1] of lane ARGV[1]. A shard that was
+# empty joins the back of the lane's ring KEYS[2]. Returns the lane's depth.
+ENQUEUE_SCRIPT = """
+local count = #ARGV - 2
+if redis.call('RPUSH', KEYS[1], unpack(ARGV, 3)) == count then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+redis.call('DEL', KEYS[4])
+redis.call('RPUSH', KEYS[4], 1)
+return redis.call('HINCRBY', KEYS[3], ARGV[1], count)
+"""
+
+# Move up to ARGV[1] entries into the processing list KEYS[2] in one round-trip:
+# first from the retry queue KEYS[1], then from the lanes, whose weights are
+# ARGV[4..] by lane index. Each pass splits the room left in the batch between
+# the lanes with work in proportion to their weights, so room a lane cannot use
+# goes to the others. Within a lane, shards are served ARGV[2] entries at a time
+# in ring order. Every step is O(1), so a batch costs O(batch size + lanes).
+TAKE_SCRIPT = """
+local retry, processing, depth, doorbell = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local limit = tonumber(ARGV[1])
+local quantum = tonumber(ARGV[2])
+local prefix = ARGV[3]
+local lane_count = #ARGV - 3
+local taken = {}
+
+local function take(source)
+    local entry = redis.call('LMOVE', source, processing, 'LEFT', 'RIGHT')
+    if entry then
+        taken[#taken + 1] = entry
+    end
+    return entry
+end
+
+local function take_lane(lane, count)
+    local ring = prefix .. lane .. ':active'
+    local got = 0
+    while got < count do
+        local shard = redis.call('LINDEX', ring, 0)
+        if not shard then
+            break
+        end
+        local list = prefix .. lane .. ':' .. shard
+        local served = 0
+        while served < quantum and got < count and take(list) do
+            served = served + 1
+            got = got + 1
+        end
+        if redis.call('LLEN', list) == 0 then
+            redis.call('LPOP', ring)
+        else
+            redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        end
+    end
+    if got > 0 then
+        redis.call('HINCRBY', depth, lane, -got)
+    end
+    return got
+end
+
+while #taken < limit and take(retry) do
+end
+
+local lanes = {}
+for lane = 0, lane_count - 1 do
+    if redis.call('EXISTS', prefix .. lane .. ':active') == 1 then
+        lanes[#lanes + 1] = lane
+    end
+end
+while #taken < limit and #lanes > 0 do
+    local total = 0
+    for _, lane in ipairs(lanes) do
+        total = total + tonumber(ARGV[lane + 4])
+    end
+    local room = limit - #taken
+    local busy = {}
+    for _, lane in ipairs(lanes) do
+        local share = math.min(math.ceil(room * tonumber(ARGV[lane + 4]) / total), limit - #taken)
+        -- A lane that filled its share may have more
+        if share > 0 and take_lane(lane, share) == share then
+            busy[#busy + 1] = lane
+        end
+    end
+    lanes = busy
+end
+
+-- Leave the doorbell rung for the next idle worker while anything is queued
+redis.call('DEL', doorbell)
+local queued = redis.call('LLEN', retry) > 0
+for lane = 0, lane_count - 1 do
+    queued = queued or redis.call('EXISTS', prefix .. lane .. ':active') == 1
+end
+if queued then
+    redis.call('RPUSH', doorbell, 1)
+end
+return taken
+"""
+
+
+def parse_lanes(spec: str) -> list:
+    """[(name, weight), ...] from ORDER_QUEUE_LANES ("name:weight,...")."""
+    lanes = []
+    for lane in spec.split(","):
+        name, weight = lane.strip().split(":")
+        if int(weight) <= 0:
+            raise ValueError(f"Lane {name} needs a positive weight")
+        lanes.append((name, int(weight)))
+    return lanes
+
+
+LANES = parse_lanes(settings.ORDER_QUEUE_LANES)
+
+
+def lane_index(name: str) -> int:
+    """Position of lane `name` in LANES; orders for an unconfigured lane go to the default lane."""
+    for index, (lane, _) in enumerate(LANES):
+        if lane == name:
+            return index
+    return 0
+
+
+def user_shard(user_id: str) -> int:
+    return zlib.crc32(user_id.encode()) % settings.ORDER_QUEUE_SHARDS
+
+
+def queue_orders(pipe, lane: int, orders, enqueued_at: float = None):
+    """
+    Queue the commands that enqueue `orders`, (order_id, shard) pairs, in `lane` on a pipeline.
+
+    The first reply is the lane's depth after the first shard's orders were added.
+    """
+    if enqueued_at is None:
+        enqueued_at = time.time()
+    by_shard = defaultdict(list)
+    for order_id, shard in orders:
+        by_shard[shard].append(queue_codec.encode(order_id, enqueued_at, lane, shard))
+    ring = f"{LANE_PREFIX}{lane}:active"
+    for shard, entries in by_shard.items():
+        for start in range(0, len(entries), ENQUEUE_CHUNK_SIZE):
+            pipe.eval(
+                ENQUEUE_SCRIPT,
+                4,
+                f"{LANE_PREFIX}{lane}:{shard}",
+                ring,
+                LANE_DEPTH,
+                DOORBELL,
+                lane,
+                shard,
+                *entries[start:start + ENQUEUE_CHUNK_SIZE],
+            )
+    pipe.incrby(ENQUEUED_TOTAL, len(orders))
+
+
+def lane_depths(retry_depth: int, raw_depths: dict, lanes: list = None) -> dict:
+    """Orders queued per lane name, from LLEN of the retry queue and HGETALL of LANE_DEPTH."""
+    depths = {RETRY_LANE: retry_depth}
+    for index, (name, _) in enumerate(lanes or LANES):
+        depths[name] = int(raw_depths.get(str(index).encode(), 0))
+    return depths
 
 
 class RedisService:
-    def __init__(self):
+    """Synchronous Redis client, used by the multiprocessing workers."""
+
+    def __init__(self, redis_url: str = None, lanes: list = None):
         # Initialize Redis connection
-        self.redis_conn = Redis.from_url(settings.REDIS_URL)
+        self.redis_conn = Redis.from_url(redis_url or settings.REDIS_URL)
         # Define an RQ queue for processing orders
         self.order_queue = Queue("orders", connection=self.redis_conn)
+        self.lanes = lanes or LANES
+        self._take_script = self.redis_conn.register_script(TAKE_SCRIPT)
 
-    async def add_order_to_queue(self, order_id):
-        # Retry mechanism for adding order to queue
-        retry_count = 0
-        while retry_count < 3:
+    def fetch_order_batch(self, consumer, batch_size, block_timeout, max_wait):
+        """
+        Move a batch of queue entries into the consumer's processing list.
+
+        Blocks up to `block_timeout` seconds for the first order, then keeps filling
+        the batch for at most `max_wait` seconds. Orders stay in the processing list
+        until the batch is acknowledged, so a crashed worker never loses them.
+        Entries are returned undecoded; see queue_codec.decode.
+        """
+        processing_key = PROCESSING_PREFIX + consumer
+        batch = self.take_order_batch(processing_key, batch_size)
+        if not batch:
+            if self.redis_conn.blpop(DOORBELL, block_timeout) is None:
+                return []
+            batch = self.take_order_batch(processing_key, batch_size)
+
+        deadline = time.monotonic() + max_wait
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Wait for more orders, but never past the batch deadline
+            if self.redis_conn.blpop(DOORBELL, remaining) is None:
+                break
+            batch.extend(self.take_order_batch(processing_key, batch_size - len(batch)))
+        return batch
+
+    def take_order_batch(self, processing_key, batch_size):
+        """Move up to `batch_size` queued entries into `processing_key` without blocking, by lane weight and shard."""
+        return self._take_script(
+            keys=[ORDER_QUEUE, processing_key, LANE_DEPTH, DOORBELL],
+            args=[batch_size, settings.ORDER_QUEUE_QUANTUM, LANE_PREFIX]
+            + [weight for _, weight in self.lanes],
+        )
+
+    def get_enqueue_times(self, order_ids):
+        """Map order IDs queued before the envelope to the epoch time they were enqueued, where known."""
+        times = self.redis_conn.hmget(ENQUEUED_AT, order_ids)
+        return {
+            order_id: float(enqueued_at)
+            for order_id, enqueued_at in zip(order_ids, times)
+            if enqueued_at is not None
+        }
+
+    def get_queue_load(self):
+        """Return the current queue depth and the number of orders ever enqueued."""
+        with self.redis_conn.pipeline(transaction=False) as pipe:
+            pipe.llen(ORDER_QUEUE)
+            pipe.hgetall(LANE_DEPTH)
+            pipe.get(ENQUEUED_TOTAL)
+            retry_depth, raw_depths, enqueued_total = pipe.execute()
+        depths = lane_depths(retry_depth, raw_depths, self.lanes)
+        return sum(depths.values()), int(enqueued_total or 0)
+
+    def ack_order_batch(self, consumer, count, legacy_order_ids=()):
+        """
+        Drop a handled batch of `count` entries from the consumer's processing list.
+
+        The batch is the tail of the list, where fetch_order_batch appended it;
+        anything before it is left for requeue_order_batch.
+        """
+        with self.redis_conn.pipeline() as pipe:
+            pipe.ltrim(PROCESSING_PREFIX + consumer, 0, -(count + 1))
+            if legacy_order_ids:
+                pipe.hdel(ENQUEUED_AT, *legacy_order_ids)
+            pipe.execute()
+
+    def dead_letter(self, consumer, entry):
+        """Move an entry that cannot be decoded from the consumer's processing list to DEAD_LETTER."""
+        with self.redis_conn.pipeline() as pipe:
+            pipe.lrem(PROCESSING_PREFIX + consumer, 1, entry)
+            pipe.rpush(DEAD_LETTER, entry)
+            pipe.execute()
+
+    def requeue_order_batch(self, consumer):
+        """Push the consumer's in-flight orders back onto the queue."""
+        return self._move_back(PROCESSING_PREFIX + consumer)
+
+    def heartbeat(self, consumer, ttl):
+        """Mark the consumer as alive for the next `ttl` seconds."""
+        self.redis_conn.set(HEARTBEAT_PREFIX + consumer, 1, ex=ttl)
+
+    def reclaim_orphaned_batches(self):
+        """Requeue processing lists left behind by consumers whose heartbeat expired."""
+        reclaimed = 0
+        for key in self.redis_conn.scan_iter(match=PROCESSING_PREFIX + "*"):
+            consumer = key.decode()[len(PROCESSING_PREFIX):]
+            if not self.redis_conn.exists(HEARTBEAT_PREFIX + consumer):
+                reclaimed += self._move_back(key)
+        return reclaimed
+
+    def _move_back(self, processing_key):
+        # Orders go back to the head of the retry queue in their original order
+        moved = 0
+        while self.redis_conn.lmove(processing_key, ORDER_QUEUE, "RIGHT", "LEFT"):
+            moved += 1
+        if moved:
             with self.redis_conn.pipeline() as pipe:
-                pipe.rpush("order_queue", order_id)  # Add order to queue
+                pipe.delete(DOORBELL)
+                pipe.rpush(DOORBELL, 1)
                 pipe.execute()
+        return moved
+
+
+class AsyncRedisService:
+    """asyncio Redis client backed by a shared connection pool, used by the API."""
+
+    def __init__(self):
+        self._pool = None
+        self._redis_conn = None
+
+    @property
+    def redis_conn(self) -> AsyncRedis:
+        # Created lazily so the pool binds to the event loop that first uses it
+        if self._redis_conn is None:
+            self._pool = BlockingConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+            )
+            self._redis_conn = AsyncRedis(connection_pool=self._pool)
+        return self._redis_conn
 
-            queue_position = self.redis_conn.lpos("order_queue", order_id)
-            if queue_position is not None:
-                return queue_position  # Return position if successfully added
-            retry_count += 1
+    async def add_order_to_queue(self, order_id, shard: int, lane: int = 0, enqueued_at: float = None):
+        # Retry mechanism for adding order to queue
+        retry_count = 0
+        while retry_count < 3:
+            try:
+                # The enqueue script returns the lane's new depth, so the
+                # order's position in its lane is known without scanning it
+                async with self.redis_conn.pipeline() as pipe:
+                    queue_orders(pipe, lane, [(order_id, shard)], enqueued_at)
+                    lane_depth, _ = await pipe.execute()
+                return lane_depth - 1
+            except RedisError:
+                retry_count += 1
         return None  # Return None if retries exhausted
 
-    def get_queue_status(self):
-        # Fetch current queue status
-        queue_length = self.redis_conn.llen("order_queue")
-        pending_orders = self.redis_conn.lrange("order_queue", 0, 9)
-        total_processed = self.redis_conn.get("total_processed")
+    async def get_queue_status(self):
+        # Fetch current queue status in a single round-trip
+        async with self.redis_conn.pipeline(transaction=False) as pipe:
+            pipe.llen(ORDER_QUEUE)
+            pipe.hgetall(LANE_DEPTH)
+            pipe.lrange(ORDER_QUEUE, 0, 9)
+            pipe.get("total_processed")
+            retry_depth, raw_depths, pending_orders, total_processed = await pipe.execute()
 
+        depths = lane_depths(retry_depth, raw_depths)
         return {
-            "queue_length": queue_length,
-            "pending_orders": [order_id.decode() for order_id in pending_orders],
+            "queue_length": sum(depths.values()),
+            "lanes": depths,
+            # Orders waiting to be retried; lane orders are not kept in one sequence
+            "pending_orders": [queue_codec.decode(entry).order_id for entry in pending_orders],
             "total_processed": int(total_processed.decode()) if total_processed else 0,
         }
 
+    async def get_lane_depths(self):
+        """Orders queued per lane name, including the retry queue."""
+        async with self.redis_conn.pipeline(transaction=False) as pipe:
+            pipe.llen(ORDER_QUEUE)
+            pipe.hgetall(LANE_DEPTH)
+            retry_depth, raw_depths = await pipe.execute()
+        return lane_depths(retry_depth, raw_depths)
+
+    def after_fork(self):
+        """Forget the pool inherited from a parent process; it belongs to the parent's loop."""
+        self._pool = None
+        self._redis_conn = None
+
+    async def close(self):
+        """Close the client and disconnect every pooled connection."""
+        if self._redis_conn is not None:
+            await self._redis_conn.aclose()
+            await self._pool.disconnect()
+            self.after_fork()
+
+
+class ChannelListener:
+    """
+    Background task calling `handler` with the JSON payload of each message
+    published on a pub/sub channel, resubscribing after connection errors.
+
+    Messages published while it is not subscribed are lost; `on_subscribe` runs
+    after every (re)subscription for consumers that must make up for them.
+    """
+
+    def __init__(self, channel: str, handler, on_subscribe=None):
+        self.channel = channel
+        self.handler = handler
+        self.on_subscribe = on_subscribe
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async with async_redis_service.redis_conn.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    if self.on_subscribe is not None:
+                        self.on_subscribe()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        self.handler(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener error on channel {self.channel}: {e}")
+                await asyncio.sleep(1)
+
 
-# Global Redis service instance
+# Global Redis service instances
 redis_service = RedisService()
+async_redis_service = AsyncRedisService()
@@ -1,12 +1,12 @@
 from fastapi import HTTPException
 from app.connections.database import db
 from app.models.managers.orders import OrderManager
-from app.services.redis_service import redis_service
+from app.services.redis_service import async_redis_service
 
 
-async def push_order_to_pipeline(order_id):
-    # Attempt to add the order to the processing queue
-    queue_position = await redis_service.add_order_to_queue(order_id)
+async def push_order_to_pipeline(order_id, shard: int, lane: int = 0, enqueued_at: float = None):
+    # Attempt to add the order to its lane of the processing queue
+    queue_position = await async_redis_service.add_order_to_queue(order_id, shard, lane, enqueued_at)
 
     # If adding to the queue fails after retries, raise an error
     if queue_position is None:
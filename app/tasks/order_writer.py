@@ -0,0 +1,97 @@
+from app.connections.database import db
+from app.core.config import settings
+from app.core.telemetry import ORDER_WRITE_BATCH_SIZE
+from app.models.managers.orders import OrderManager
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OrderWriteCoalescer:
+    """
+    Groups concurrent single-order creates into shared transactions.
+
+    Callers queue their order and await a future. A background task takes the
+    first waiting order, collects whatever else arrives within `window_ms` (up
+    to `max_batch` orders) and writes the group with OrderManager.create_orders,
+    so one commit covers many requests. Each future gets its own created order
+    or the ValueError that rejected it; a database error fails the whole group.
+    """
+
+    def __init__(self, max_batch: int, window_ms: float):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """Start the flush task on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush the orders already queued and stop the flush task."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def create_order(self, order_id: str, user_id: str, item_ids: list, total_amount: float, idempotency_key: str = None) -> dict:
+        """Create one order as part of the next group write and return it as a dict."""
+        if self._task is None or self._task.get_loop() is not asyncio.get_running_loop():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((order_id, user_id, item_ids, total_amount, idempotency_key), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - loop.time()
+                    if timeout > 0:
+                        entry = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        # Window is over; still take whatever is already waiting
+                        entry = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        ORDER_WRITE_BATCH_SIZE.observe(len(batch))
+        try:
+            async with db.session() as session:
+                results = await OrderManager(session).create_orders(
+                    [order for order, _ in batch]
+                )
+        except Exception as e:
+            logger.error(f"Writing {len(batch)} coalesced orders failed: {e}")
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # The caller went away (request cancelled)
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+order_writer = OrderWriteCoalescer(
+    settings.ORDER_WRITE_MAX_BATCH, settings.ORDER_WRITE_WINDOW_MS
+)
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database before any app module reads settings
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "tests.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DB_ECHO_LOG"] = "false"
@@ -0,0 +1,41 @@
+"""An /orders/events stream must close once a single batch completes every order it watches."""
+import asyncio
+from datetime import datetime
+
+from app.api.endpoints import orders
+from app.core.config import settings
+from app.models.order import OrderStatus
+from app.services.order_events import order_event_hub
+
+
+def test_stream_closes_after_one_batch_completes_all_orders(monkeypatch):
+    order_ids = [f"ORD-{n}" for n in range(settings.ORDER_EVENTS_MAX_ORDERS)]
+
+    async def current_statuses(order_ids):
+        return [
+            {"order_id": order_id, "status": OrderStatus.PROCESSING.value, "updated_at": None}
+            for order_id in order_ids
+        ]
+
+    monkeypatch.setattr(orders, "_current_statuses", current_statuses)
+
+    async def stream():
+        subscription = order_event_hub.subscribe(order_ids)
+        chunks = orders._order_event_stream(subscription)
+        received = [await chunks.__anext__() for _ in order_ids]
+        # What a worker publishes when one batch completes them all
+        order_event_hub.dispatch(
+            {
+                "order_ids": order_ids,
+                "status": OrderStatus.COMPLETED.value,
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+        )
+        received += [chunk async for chunk in chunks]
+        order_event_hub.unsubscribe(subscription)
+        return received
+
+    received = asyncio.run(asyncio.wait_for(stream(), 5))
+    completed = [chunk for chunk in received if '"completed"' in chunk]
+    assert len(completed) == len(order_ids)
+    assert order_event_hub.subscriber_count == 0
@@ -0,0 +1,82 @@
+"""
+The order status, metrics and listing queries must keep using an index on SQLite.
+
+The statements are captured from the OrderManager methods that run them, so the
+check follows the code instead of a copy of its queries.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.connections.database import db
+from app.models.managers.items import ItemManager
+from app.models.managers.orders import OrderManager
+from app.models.managers.users import UserManager
+from app.models.order import OrderStatus
+
+SINCE = datetime(2024, 1, 1)
+AFTER = (SINCE, "ORD-0")
+
+CALLS = {
+    "orders by status": lambda manager: manager.get_all_orders(OrderStatus.PENDING),
+    "status summary": lambda manager: manager.get_status_summary(),
+    "order details": lambda manager: manager.get_order_details(["ORD-0"]),
+    "listing": lambda manager: manager.list_orders(100),
+    "listing next page": lambda manager: manager.list_orders(100, after=AFTER),
+    "listing by status": lambda manager: manager.list_orders(
+        100, status=OrderStatus.PENDING, after=AFTER
+    ),
+    "listing by user": lambda manager: manager.list_orders(100, user_id="user-0", after=AFTER),
+    "listing by creation time": lambda manager: manager.list_orders(
+        100, created_from=SINCE, created_to=datetime(2025, 1, 1)
+    ),
+}
+
+
+async def seed_order():
+    """Store ORD-0 with one line, so eager loads of its lines issue their query."""
+    async with db.session() as session:
+        if await OrderManager(session).get_order("ORD-0"):
+            return
+        user = await UserManager(session).create_user(name="Plans", email="plans@example.com")
+        item = await ItemManager(session).create_item(name="Item", description="", price=2.0)
+        await OrderManager(session).create_orders([("ORD-0", user.id, [item.id], 2.0, None)])
+
+
+async def query_plans(call) -> list:
+    """Run `call` on an OrderManager and return the query plan of every statement it issued."""
+    await db.create_all()
+    await seed_order()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db._engine.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        async with db.session() as session:
+            await call(OrderManager(session))
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with db._engine.connect() as conn:
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append([row[-1] for row in result])
+    await db.close()
+    return plans
+
+
+@pytest.mark.parametrize("name", CALLS)
+def test_queries_use_an_index(name):
+    plans = asyncio.run(query_plans(CALLS[name]))
+    assert plans, f"{name} issued no SELECT"
+    for plan in plans:
+        # Every step that reads a table must go through an index
+        scans = [step for step in plan if step.startswith(("SCAN", "SEARCH")) and "INDEX" not in step]
+        assert not scans, f"{name}: {' | '.join(plan)}"